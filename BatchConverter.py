@@ -0,0 +1,133 @@
+from CommandHistory import ACommandHistory
+from DrawingPad import ADrawingPad
+from PadStats import APadStats
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import os
+
+def ConvertSegment(lines, padOptions, collectStats=False, optimizer=None):
+    '''
+    Runs a fresh ADrawingPad over lines, and optimizes each line's output
+    with optimizer if it's an ACommandOptimizer.
+
+    Returns (output, error, stats): their joined output, each line's
+    followed by a blank line just like alpc2.py, the exception that
+    stopped us early, if any, and the pad's APadStats if collectStats
+    is True, else None.
+    '''
+    stats = APadStats() if collectStats else None
+
+    # Workers only need each line's output, not the whole history
+    drawingPad = ADrawingPad(
+        history=ACommandHistory("ring", maxLength=1), stats=stats,
+        **padOptions
+    )
+
+    outputs = []
+
+    try:
+        for line in lines:
+            output = drawingPad.Action(line)
+
+            if optimizer is not None:
+                output = optimizer.OptimizeOutput(output)
+
+            outputs.append(output + "\n\n")
+    except Exception as error:
+        return "".join(outputs), error, stats
+
+    return "".join(outputs), None, stats
+
+class ABatchConverter:
+    '''
+    Converts lines of hexadecimal instructions in a process pool.
+
+    "CLR" resets all of a drawing pad's state, so every line whose first
+    opcode is "CLR" starts a segment that doesn't depend on the lines
+    before it. Lines are split into such segments, segments are grouped
+    into tasks of about chunkSize lines, and each task is converted by a
+    fresh ADrawingPad. Output comes back in the original order and
+    matches a serial run byte for byte.
+
+    If given an APadStats, each task's stats are merged into it. If given
+    an ACommandOptimizer, each task optimizes its output with a fresh copy
+    of it. Every task after the first starts with "CLR", which resets its
+    state, so this also matches a serial run.
+    '''
+    def __init__(self, workers=None, chunkSize=256, stats=None,
+      optimizer=None, **padOptions):
+        if chunkSize < 1:
+            raise ValueError("chunkSize must be at least 1.")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.chunkSize = chunkSize
+        self.stats = stats
+        self.optimizer = optimizer
+
+        # Keyword arguments for each ADrawingPad, e.g. engine="numpy"
+        self.padOptions = padOptions
+
+    def StartsWithClear(self, line):
+        ''' Returns whether the first opcode in line is "CLR" '''
+        return ADrawingPad.StartsWithClear(line)
+
+    def Tasks(self, lines):
+        '''
+        Splits lines into independent segments, and yields lists of
+        whole segments holding about chunkSize lines each.
+        '''
+        task = []
+
+        for line in lines:
+            # A full task may only end where a new segment starts
+            if len(task) >= self.chunkSize and self.StartsWithClear(line):
+                yield task
+                task = []
+
+            task.append(line)
+
+        if task:
+            yield task
+
+    def ConvertLines(self, lines):
+        '''
+        Converts lines in our process pool, and yields each task's output
+        in order. At most two tasks per worker are in flight at once.
+
+        If a line fails to convert, yields the output before it and then
+        raises its exception, like a serial run would.
+        '''
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+
+            for task in self.Tasks(lines):
+                pending.append(executor.submit(
+                    ConvertSegment, task, self.padOptions,
+                    self.stats is not None, self.optimizer
+                ))
+
+                if len(pending) >= self.workers * 2:
+                    yield from self.__Results(pending.popleft())
+
+            while pending:
+                yield from self.__Results(pending.popleft())
+
+    def __Results(self, future):
+        ''' Yields a task's output, then raises its error if it had one '''
+        output, error, stats = future.result()
+
+        if stats is not None:
+            self.stats.Merge(stats)
+
+        yield output
+
+        if error is not None:
+            raise error
+
+    def ConvertFile(self, inPath, outPath):
+        ''' Converts the file at inPath, writing the output to outPath '''
+        with open(inPath, "r") as inFile, open(outPath, "w") as outFile:
+            for output in self.ConvertLines(inFile):
+                outFile.write(output)
@@ -0,0 +1,354 @@
+from CommandHistory import ACommandHistory
+from DrawingPad import ADrawingPad
+from HexDecConverter import AHexDecConverter
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+class AWorkloadGenerator:
+    '''
+    Builds synthetic lines of hexadecimal instructions with
+    AHexDecConverter.Encode, reproducibly from a seed.
+
+    "inBounds": long MV runs that stay on the pad.
+    "crossings": MV runs where every segment crosses the pad's edge.
+    "toggling": many short PEN, C0 and MV commands.
+    "junk": short command groups with junk bytes before each opcode.
+    '''
+    # Bytes that are never opcodes, used as junk between commands
+    kJunkCodes = ("00", "12", "3F", "7F", "FF", "E1", "9B")
+
+    # How far from the edges our in-bounds walks stay
+    kWalkBound = 8000
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.hexDecConverter = AHexDecConverter()
+
+        # Builds a line holding about n coordinate pairs
+        self.lineBuilders = {
+            "inBounds": self.__InBoundsLine,
+            "crossings": self.__CrossingsLine,
+            "toggling": self.__TogglingLine,
+            "junk": self.__JunkLine
+        }
+
+    def Workloads(self):
+        ''' Returns the names of the workloads we can build '''
+        return list(self.lineBuilders)
+
+    def Lines(self, workload, numberOfLines, pairsPerLine):
+        ''' Returns numberOfLines lines of workload, each ending in "\\n" '''
+        BuildLine = self.lineBuilders[workload]
+
+        return [BuildLine(pairsPerLine) + "\n" for i in range(numberOfLines)]
+
+    def __Color(self):
+        ''' Returns a "C0" command with a random opaque color '''
+        color = [self.random.randint(0, 255) for i in range(3)] + [255]
+
+        return "A0" + self.hexDecConverter.EncodeMany(color)
+
+    def __Pen(self, down):
+        ''' Returns a "PEN" command '''
+        return "80" + self.hexDecConverter.Encode(1 if down else 0)
+
+    def __Walk(self, n, maxStep):
+        '''
+        Returns n deltas of a random walk from (0, 0) that stays
+        within kWalkBound, flattened to x, y, x, y...
+        '''
+        bound = self.kWalkBound
+        x = y = 0
+        deltas = []
+
+        for i in range(n):
+            deltaX = self.random.randint(-maxStep, maxStep)
+            deltaY = self.random.randint(-maxStep, maxStep)
+
+            # Turn back rather than leave the walk's bounds
+            if not -bound <= x + deltaX <= bound:
+                deltaX = -deltaX
+            if not -bound <= y + deltaY <= bound:
+                deltaY = -deltaY
+
+            x += deltaX
+            y += deltaY
+            deltas += (deltaX, deltaY)
+
+        return deltas
+
+    def __EncodedWalk(self, n, maxStep):
+        ''' Returns __Walk's deltas, encoded '''
+        return self.hexDecConverter.EncodeMany(self.__Walk(n, maxStep))
+
+    def __InBoundsLine(self, n):
+        walk = self.__EncodedWalk(n, 100)
+
+        return "F0" + self.__Color() + self.__Pen(True) + "C0" + walk
+
+    def __CrossingsLine(self, n):
+        # Start near the right edge, then jump back and forth across it
+        deltas = [7000, 0]
+
+        for i in range(n - 1):
+            deltaX = 2000 if i % 2 == 0 else -2000
+            deltas += (deltaX, self.random.randint(-50, 50))
+
+        moves = self.hexDecConverter.EncodeMany(deltas)
+
+        return "F0" + self.__Color() + self.__Pen(True) + "C0" + moves
+
+    def __TogglingLine(self, n):
+        parts = ["F0"]
+
+        for i in range(n):
+            parts.append(self.__Pen(i % 2 == 0))
+            parts.append(self.__Color())
+            parts.append("C0" + self.__EncodedWalk(1, 50))
+
+        return "".join(parts)
+
+    def __JunkLine(self, n):
+        parts = []
+
+        for i in range(max(n // 4, 1)):
+            parts.append(self.__Junk())
+            parts.append("F0")
+            parts.append(self.__Junk())
+            parts.append(self.__Color())
+            parts.append(self.__Pen(True))
+            parts.append("C0" + self.__EncodedWalk(4, 100))
+
+        return "".join(parts)
+
+    def __Junk(self):
+        ''' Returns a few random junk bytes '''
+        numberOfCodes = self.random.randint(1, 6)
+
+        return "".join(self.random.choices(self.kJunkCodes, k=numberOfCodes))
+
+class ABenchmark:
+    '''
+    Measures throughput of ADrawingPad.Action, AHexDecConverter's
+    Decode and Encode, and the alpc2.py end-to-end path, over workloads
+    from AWorkloadGenerator. Every measurement keeps the best of
+    repeat runs.
+    '''
+    def __init__(self, numberOfLines=200, pairsPerLine=500, repeat=3,
+      seed=0, **padOptions):
+        self.numberOfLines = numberOfLines
+        self.pairsPerLine = pairsPerLine
+        self.repeat = repeat
+        self.seed = seed
+
+        # Keyword arguments for each ADrawingPad, e.g. engine="numpy"
+        self.padOptions = padOptions
+
+        self.workloadGenerator = AWorkloadGenerator(seed)
+
+    def Run(self):
+        ''' Runs every benchmark and returns the results as a dictionary '''
+        workloads = {
+            workload: self.workloadGenerator.Lines(
+                workload, self.numberOfLines, self.pairsPerLine
+            )
+            for workload in self.workloadGenerator.Workloads()
+        }
+
+        results = {
+            "parameters": {
+                "numberOfLines": self.numberOfLines,
+                "pairsPerLine": self.pairsPerLine,
+                "repeat": self.repeat,
+                "seed": self.seed,
+                "padOptions": self.padOptions
+            },
+            "environment": self.Environment(),
+            "action": {
+                workload: self.TimeAction(lines)
+                for workload, lines in workloads.items()
+            },
+            "converter": self.TimeConverter(),
+            "endToEnd": self.TimeEndToEnd(
+                [line for lines in workloads.values() for line in lines]
+            )
+        }
+
+        return results
+
+    def Environment(self):
+        ''' Returns the revision and platform we're measuring '''
+        try:
+            revision = subprocess.run(
+                ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.strip()
+        except OSError:
+            revision = ""
+
+        return {
+            "revision": revision,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        }
+
+    def TimeAction(self, lines):
+        ''' Returns bytes/sec and commands/sec of Action over lines '''
+        numberOfBytes = sum(len(line) for line in lines)
+
+        def Convert():
+            drawingPad = ADrawingPad(
+                history=ACommandHistory("ring", maxLength=1), **self.padOptions
+            )
+            numberOfCommands = 0
+
+            for line in lines:
+                drawingPad.Action(line)
+                numberOfCommands += len(drawingPad.currentCommandList)
+
+            return numberOfCommands
+
+        seconds, numberOfCommands = self.__Best(Convert)
+
+        return {
+            "seconds": seconds,
+            "bytes": numberOfBytes,
+            "commands": numberOfCommands,
+            "bytesPerSecond": numberOfBytes / seconds,
+            "commandsPerSecond": numberOfCommands / seconds
+        }
+
+    def TimeConverter(self):
+        ''' Returns numbers/sec of Decode, DecodeMany, Encode and EncodeMany '''
+        hexDecConverter = AHexDecConverter()
+        randomNumbers = random.Random(self.seed)
+
+        count = self.numberOfLines * self.pairsPerLine
+        numbers = [randomNumbers.randint(-8192, 8191) for i in range(count)]
+        hexString = hexDecConverter.EncodeMany(numbers)
+        hexPairs = [
+            (hexString[i:i + 2], hexString[i + 2:i + 4])
+            for i in range(0, len(hexString), 4)
+        ]
+
+        def Decode():
+            for hi, lo in hexPairs:
+                hexDecConverter.Decode(hi, lo)
+
+        def Encode():
+            for number in numbers:
+                hexDecConverter.Encode(number)
+
+        def DecodeMany():
+            hexDecConverter.DecodeMany(hexString)
+
+        def EncodeMany():
+            hexDecConverter.EncodeMany(numbers)
+
+        timings = {
+            "decode": self.__Best(Decode)[0],
+            "decodeMany": self.__Best(DecodeMany)[0],
+            "encode": self.__Best(Encode)[0],
+            "encodeMany": self.__Best(EncodeMany)[0]
+        }
+
+        return {
+            name: {"seconds": seconds, "numbersPerSecond": count / seconds}
+            for name, seconds in timings.items()
+        }
+
+    def TimeEndToEnd(self, lines):
+        '''
+        Returns bytes/sec of running alpc2.py over lines in a fresh
+        interpreter, startup and file I/O included.
+        '''
+        scriptDirectory = os.path.dirname(os.path.abspath(__file__))
+
+        with tempfile.TemporaryDirectory() as directory:
+            inPath = os.path.join(directory, "input.txt")
+            outPath = os.path.join(directory, "output.txt")
+
+            with open(inPath, "w") as inFile:
+                inFile.writelines(lines)
+
+            command = [sys.executable, "-m", "alpc2", inPath, outPath]
+            for option, value in self.padOptions.items():
+                command += ["--" + option, value]
+
+            def Convert():
+                subprocess.run(command, cwd=scriptDirectory, check=True)
+
+            seconds = self.__Best(Convert)[0]
+            numberOfBytes = os.path.getsize(inPath)
+
+        return {
+            "seconds": seconds,
+            "bytes": numberOfBytes,
+            "bytesPerSecond": numberOfBytes / seconds
+        }
+
+    def __Best(self, function):
+        ''' Returns (fastest seconds, result) of repeat calls to function '''
+        bestSeconds = None
+
+        for i in range(self.repeat):
+            startTime = time.perf_counter()
+            result = function()
+            seconds = time.perf_counter() - startTime
+
+            if bestSeconds is None or seconds < bestSeconds:
+                bestSeconds = seconds
+
+        return bestSeconds, result
+
+def Main(arguments=None):
+    '''
+    Benchmarks the drawing pad converter on synthetic workloads
+    and saves the results as JSON.
+    '''
+    parser = argparse.ArgumentParser(description=Main.__doc__)
+    parser.add_argument("--lines", type=int, default=200,
+      help="Lines per workload.")
+    parser.add_argument("--pairs", type=int, default=500,
+      help="Coordinate pairs, or command groups, per line.")
+    parser.add_argument("--repeat", type=int, default=3,
+      help="Runs per measurement. The fastest is kept.")
+    parser.add_argument("--seed", type=int, default=0,
+      help="Seed for the workload generator.")
+    parser.add_argument("--engine", choices=ADrawingPad.kEngines,
+      default="python", help="Engine used to move the pen.")
+    parser.add_argument("--json", default="bench_output.json",
+      help="File to save the results to, or - for stdout.")
+    arguments = parser.parse_args(arguments)
+
+    benchmark = ABenchmark(arguments.lines, arguments.pairs,
+      arguments.repeat, arguments.seed, engine=arguments.engine)
+    results = benchmark.Run()
+
+    resultsText = json.dumps(results, indent=2)
+
+    if arguments.json == "-":
+        print(resultsText)
+    else:
+        with open(arguments.json, "w") as jsonFile:
+            jsonFile.write(resultsText + "\n")
+
+        for workload, result in results["action"].items():
+            print("Action, {}: {:,.0f} bytes/s, {:,.0f} commands/s".format(
+              workload, result["bytesPerSecond"], result["commandsPerSecond"]))
+        for name, result in results["converter"].items():
+            print("{}: {:,.0f} numbers/s".format(
+              name, result["numbersPerSecond"]))
+        print("alpc2.py: {:,.0f} bytes/s".format(
+          results["endToEnd"]["bytesPerSecond"]))
+
+if __name__ == "__main__":
+    Main()
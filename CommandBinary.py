@@ -0,0 +1,223 @@
+from CommandRecords import AClearCommand, AColorCommand, AMoveCommand
+from CommandRecords import APenCommand, ParseCommand
+
+from array import array
+
+import io
+import struct
+import sys
+
+# NumPy is optional, and only needed for ABinaryCommandReader.PointsArray
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class ABinaryCommandFormat:
+    '''
+    Compact little-endian binary form of a drawing pad command stream.
+
+    The stream starts with the 8-byte kMagic header. Every command is then
+    an 8-byte record header, (tag, flag, count), followed by its payload,
+    padded to a multiple of 4 bytes:
+
+    CLR:  tag 0xF0, no payload.
+    PEN:  tag 0x80, flag 1 for "UP" or 0 for "DOWN", no payload.
+    C0:   tag 0xA0, count color values, one uint8 each.
+    MV:   tag 0xC0, count points, two int16 each.
+    MV64: tag 0xC1, count points, two int64 each, for moves that don't
+          fit in int16. Clipping far-off moves can give any of those.
+    '''
+    # Stream header: name and version
+    kMagic = b"DPCB\x02\x00\x00\x00"
+
+    # Record header: tag, flag and count
+    kHeader = struct.Struct("<BBxxI")
+
+    # Record tags, the opcodes from ADrawingPad.kCodebook
+    kClearTag = 0xF0
+    kPenTag = 0x80
+    kColorTag = 0xA0
+    kMoveTag = 0xC0
+    kWideMoveTag = 0xC1
+
+    # The range of an int16 coordinate
+    kShortBounds = (-32768, 32767)
+
+class ABinaryCommandWriter(ABinaryCommandFormat):
+    '''
+    Writes commands to a binary file object in ABinaryCommandFormat.
+
+    Commands may be CommandRecords objects or their text form.
+    '''
+    def __init__(self, outFile):
+        self.outFile = outFile
+        self.outFile.write(self.kMagic)
+
+    @classmethod
+    def ToBytes(cls, commands):
+        ''' Returns commands packed in ABinaryCommandFormat '''
+        outFile = io.BytesIO()
+        cls(outFile).Write(commands)
+
+        return outFile.getvalue()
+
+    def Write(self, commands):
+        ''' Writes every command in commands '''
+        self.outFile.write(
+            b"".join([self.Pack(command) for command in commands])
+        )
+
+    def Pack(self, command):
+        ''' Returns the binary record for a single command '''
+        if isinstance(command, str):
+            command = ParseCommand(command)
+
+        if isinstance(command, AMoveCommand):
+            coordinates = command.coordinates
+            shortBounds = self.kShortBounds
+
+            if (shortBounds[0] <= min(coordinates) and
+              max(coordinates) <= shortBounds[1]):
+                tag, payload = self.kMoveTag, array('h', coordinates)
+            else:
+                tag, payload = self.kWideMoveTag, array('q', coordinates)
+
+            if sys.byteorder == "big":
+                payload.byteswap()
+
+            header = self.kHeader.pack(tag, 0, len(coordinates) // 2)
+            return header + payload.tobytes()
+
+        if isinstance(command, AColorCommand):
+            payload = bytes(command.color)
+            payload += bytes(-len(payload) % 4)
+
+            header = self.kHeader.pack(self.kColorTag, 0, len(command.color))
+            return header + payload
+
+        if isinstance(command, APenCommand):
+            return self.kHeader.pack(self.kPenTag, int(command.up), 0)
+
+        if isinstance(command, AClearCommand):
+            return self.kHeader.pack(self.kClearTag, 0, 0)
+
+        raise TypeError("Can't pack " + repr(command))
+
+class ABinaryCommandReader(ABinaryCommandFormat):
+    '''
+    Reads commands from a buffer in ABinaryCommandFormat without copying
+    it. The buffer may be bytes, a bytearray, an mmap, or anything else
+    with the buffer protocol.
+
+    Each record is (tag, flag, values), where values is a memoryview
+    into the buffer: uint8 colors, or flat x, y, x, y... coordinates.
+    On big-endian hosts coordinates are byteswapped into an array, a copy.
+    '''
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer).cast("B")
+
+        if self.buffer[:len(self.kMagic)] != self.kMagic:
+            raise ValueError("Not a binary command stream.")
+
+        # Offset of each record, found by walking the record headers once
+        self.offsets = []
+
+        offset = len(self.kMagic)
+        bufferLength = len(self.buffer)
+
+        while offset < bufferLength:
+            self.offsets.append(offset)
+            offset += self.kHeader.size + self.__PayloadSize(offset)
+
+        if offset != bufferLength:
+            raise ValueError("Binary command stream is truncated.")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        ''' Returns record i as (tag, flag, values) '''
+        offset = self.offsets[i]
+        tag, flag, count = self.kHeader.unpack_from(self.buffer, offset)
+        offset += self.kHeader.size
+
+        if tag == self.kMoveTag:
+            values = self.buffer[offset:offset + count * 4].cast("h")
+        elif tag == self.kWideMoveTag:
+            values = self.buffer[offset:offset + count * 16].cast("q")
+        else:
+            return tag, flag, self.buffer[offset:offset + count]
+
+        # The stream is little-endian, so values cast on this host need
+        # their bytes swapped
+        if sys.byteorder == "big":
+            values = array(values.format, values)
+            values.byteswap()
+
+        return tag, flag, values
+
+    def PointsArray(self, i):
+        '''
+        Returns the points of MV record i as an (n, 2) NumPy array
+        that shares memory with the buffer.
+        '''
+        if numpy is None:
+            raise ImportError("PointsArray requires NumPy to be installed.")
+
+        offset = self.offsets[i]
+        tag, flag, count = self.kHeader.unpack_from(self.buffer, offset)
+
+        if tag == self.kMoveTag:
+            dtype = numpy.dtype("<i2")
+        elif tag == self.kWideMoveTag:
+            dtype = numpy.dtype("<i8")
+        else:
+            raise ValueError("Record " + str(i) + " is not a move.")
+
+        return numpy.frombuffer(
+            self.buffer, dtype, count * 2, offset + self.kHeader.size
+        ).reshape(count, 2)
+
+    def Record(self, i):
+        ''' Returns record i as a CommandRecords object '''
+        tag, flag, values = self[i]
+
+        if tag in (self.kMoveTag, self.kWideMoveTag):
+            return AMoveCommand(zip(values[0::2], values[1::2]))
+        if tag == self.kColorTag:
+            return AColorCommand(values)
+        if tag == self.kPenTag:
+            return APenCommand(bool(flag))
+
+        return AClearCommand()
+
+    def Records(self):
+        ''' Returns every record as a CommandRecords object '''
+        return [self.Record(i) for i in range(len(self.offsets))]
+
+    def ToText(self):
+        '''
+        Returns the command stream as text, exactly as
+        ADrawingPad.GetCommandString would.
+        '''
+        return ";\n".join([str(record) for record in self.Records()]) + ";"
+
+    def __PayloadSize(self, offset):
+        ''' Returns the padded payload size of the record at offset '''
+        tag, flag, count = self.kHeader.unpack_from(self.buffer, offset)
+
+        if tag == self.kMoveTag:
+            return count * 4
+        if tag == self.kWideMoveTag:
+            return count * 16
+        if tag == self.kColorTag:
+            return count + -count % 4
+        if tag in (self.kPenTag, self.kClearTag):
+            return 0
+
+        raise ValueError("Unknown record tag " + hex(tag) + ".")
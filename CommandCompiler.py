@@ -0,0 +1,225 @@
+from CommandRecords import AClearCommand, AColorCommand, AMoveCommand
+from CommandRecords import APenCommand, ParseCommand
+from DrawingPad import ADrawingPad
+from HexDecConverter import AHexDecConverter
+
+import argparse
+import re
+
+class ACommandCompiler:
+    '''
+    Compiles drawing pad commands, as ADrawingPad.Action outputs them,
+    back into hexadecimal instructions.
+
+    "MV" points are absolute, so we turn them back into the deltas the
+    pad adds up, carrying the pen's position between calls like
+    ADrawingPad does. A delta too big for one argument is split into
+    steps along its segment. With pack, consecutive "MV"s share one "MV"
+    opcode, and a run with the pen up keeps only its last point.
+
+    Converting what we compile gives back the same drawing. If it stays
+    on the pad, the commands are the same too, with each packed run of
+    "MV"s merged into one, or the very same text without pack. Splitting
+    a delta too big for one argument adds a point for each extra step,
+    so "MV"s with those steps come back with the points in between.
+    '''
+    # A command in output text, and the numbers in its arguments
+    kCommandPattern = re.compile(r"(CLR|PEN|C0|MV)([^;]*);")
+    kNumberPattern = re.compile(r"-?\d+")
+
+    # Smallest and largest delta a single argument takes
+    kStepBounds = ADrawingPad.kByteValueBounds
+
+    def __init__(self, pack=True):
+        self.pack = pack
+        self.hexDecConverter = AHexDecConverter()
+
+        # The pen's state, as ADrawingPad starts it
+        self.currentPoint = (0, 0)  # Current pen coordinates
+        self.penUp = True           # If the pen is currently up or not
+
+        # Points of the "MV" run we're building
+        self.runPoints = []
+
+    def Compile(self, commands):
+        '''
+        Returns commands, CommandRecords objects or their text form,
+        compiled to hexadecimal.
+        '''
+        codes = []
+
+        for command in commands:
+            if isinstance(command, str):
+                command = ParseCommand(command)
+
+            if isinstance(command, AMoveCommand):
+                self.__AddMove(codes, command.points)
+            elif isinstance(command, APenCommand):
+                self.__AddPen(codes, command.up)
+            elif isinstance(command, AColorCommand):
+                self.__AddColor(codes, command.color)
+            elif isinstance(command, AClearCommand):
+                self.__AddClear(codes)
+
+        self.__AddRun(codes)
+
+        return "".join(codes)
+
+    def CompileText(self, text):
+        '''
+        Returns every command in text, like the output of Action or a
+        line's block of an alpc2.py output file, compiled to hexadecimal.
+        Messages are skipped.
+
+        Parses the whole text at once, rather than command by command.
+        '''
+        numberPattern = self.kNumberPattern
+        codes = []
+
+        for name, arguments in self.kCommandPattern.findall(text):
+            if name == "MV":
+                numbers = [
+                    int(number) for number in numberPattern.findall(arguments)
+                ]
+                self.__AddMove(codes, list(zip(numbers[0::2], numbers[1::2])))
+            elif name == "PEN":
+                self.__AddPen(codes, arguments.strip() == "UP")
+            elif name == "C0":
+                self.__AddColor(codes, [
+                    int(number) for number in numberPattern.findall(arguments)
+                ])
+            else:
+                self.__AddClear(codes)
+
+        self.__AddRun(codes)
+
+        return "".join(codes)
+
+    def CompileFile(self, inFile, outFile):
+        '''
+        Compiles a file alpc2.py wrote to outFile, one line of hexadecimal
+        for each line it converted. Blocks without commands, like
+        "No valid commands were parsed", become empty lines.
+        '''
+        block = []
+
+        for line in inFile:
+            # A blank line ends each converted line's block
+            if line.strip():
+                block.append(line)
+                continue
+
+            outFile.write(self.CompileText("".join(block)) + "\n")
+            block = []
+
+        if block:
+            outFile.write(self.CompileText("".join(block)) + "\n")
+
+    def __AddMove(self, codes, points):
+        ''' Adds points to our "MV" run, compiling it unless we pack '''
+        self.runPoints += points
+
+        if not self.pack:
+            self.__AddRun(codes)
+
+    def __AddRun(self, codes):
+        ''' Appends our "MV" run to codes, as deltas, and empties it '''
+        if not self.runPoints:
+            return
+
+        points = self.runPoints
+        self.runPoints = []
+
+        # With the pen up only the last point matters
+        if self.pack and self.penUp:
+            points = points[-1:]
+
+        minStep, maxStep = self.kStepBounds
+        deltas = []
+        lastX, lastY = self.currentPoint
+
+        for x, y in points:
+            deltaX = x - lastX
+            deltaY = y - lastY
+
+            if minStep <= deltaX <= maxStep and minStep <= deltaY <= maxStep:
+                deltas += (deltaX, deltaY)
+            else:
+                deltas += self.__Split(deltaX, deltaY)
+
+            lastX, lastY = x, y
+
+        self.currentPoint = (lastX, lastY)
+
+        codes.append("C0" + self.hexDecConverter.EncodeMany(deltas))
+
+    def __Split(self, deltaX, deltaY):
+        '''
+        Returns the flat deltas of the fewest steps along the segment
+        through (deltaX, deltaY) that each fit in one argument.
+        '''
+        minStep, maxStep = self.kStepBounds
+
+        # Steps each axis needs, whichever way it goes
+        numberOfSteps = max(
+            -(-delta // maxStep) if delta > 0 else -(-delta // minStep)
+            for delta in (deltaX, deltaY)
+        )
+
+        deltas = []
+        lastX = lastY = 0
+
+        for step in range(1, numberOfSteps + 1):
+            # Rounded to the nearest point on the segment
+            x = (2 * step * deltaX + numberOfSteps) // (2 * numberOfSteps)
+            y = (2 * step * deltaY + numberOfSteps) // (2 * numberOfSteps)
+
+            deltas += (x - lastX, y - lastY)
+            lastX, lastY = x, y
+
+        return deltas
+
+    def __AddPen(self, codes, up):
+        ''' Appends "PEN", after our "MV" run '''
+        self.__AddRun(codes)
+        self.penUp = up
+
+        codes.append("80" + self.hexDecConverter.Encode(0 if up else 1))
+
+    def __AddColor(self, codes, color):
+        ''' Appends "C0", after our "MV" run '''
+        self.__AddRun(codes)
+
+        codes.append("A0" + self.hexDecConverter.EncodeMany(color))
+
+    def __AddClear(self, codes):
+        ''' Appends "CLR", after our "MV" run, and resets the pen '''
+        self.__AddRun(codes)
+
+        self.currentPoint = (0, 0)
+        self.penUp = True
+
+        codes.append("F0")
+
+def Main(arguments=None):
+    '''
+    Compiles a file of drawing pad commands, as alpc2.py writes them,
+    back to hexadecimal instructions, one line for each line converted.
+    '''
+    parser = argparse.ArgumentParser(description=Main.__doc__)
+    parser.add_argument("input", nargs="?", default="output.txt",
+      help="File of commands to compile. Defaults to output.txt.")
+    parser.add_argument("output", nargs="?", default="compiled.txt",
+      help="File to write. Defaults to compiled.txt.")
+    parser.add_argument("--no-pack", action="store_true",
+      help="Give each MV its own opcode, so the text round-trips exactly.")
+    arguments = parser.parse_args(arguments)
+
+    commandCompiler = ACommandCompiler(not arguments.no_pack)
+
+    with open(arguments.input) as inFile:
+        with open(arguments.output, "w") as outFile:
+            commandCompiler.CompileFile(inFile, outFile)
+
+if __name__ == "__main__":
+    Main()
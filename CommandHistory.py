@@ -0,0 +1,164 @@
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
+
+import pickle
+import tempfile
+
+class ACommandHistory:
+    '''
+    Holds every command an ADrawingPad has parsed, under one of
+    these policies:
+
+    "unbounded": keeps every command in memory.
+    "ring": keeps only the last maxLength commands.
+    "disk": keeps up to spillLength commands in memory,
+    and spills older ones to a temporary file.
+
+    Each command gets a cursor: the number of commands added before it.
+
+    Like the list ADrawingPad.commandList used to be, a history can be
+    extended with += and, except under "disk", indexed and sliced. Indexes
+    count the commands we still hold, not cursors.
+    '''
+    # History policies
+    kPolicies = ("unbounded", "ring", "disk")
+
+    def __init__(self, policy="unbounded", maxLength=None,
+      spillLength=65536, spillDirectory=None):
+        if policy not in self.kPolicies:
+            raise ValueError("policy must be one of " + str(self.kPolicies))
+        if policy == "ring" and not (maxLength and maxLength > 0):
+            raise ValueError("The ring policy needs a positive maxLength.")
+        if policy == "disk" and not spillLength > 0:
+            raise ValueError("The disk policy needs a positive spillLength.")
+
+        self.policy = policy
+        self.spillLength = spillLength
+        self.spillDirectory = spillDirectory
+
+        # Commands held in memory
+        self.commands = deque(maxlen=maxLength if policy == "ring" else None)
+
+        # Number of commands ever added
+        self.cursor = 0
+
+        # Spilled batches: their first cursors and offsets in spillFile
+        self.spillFile = None
+        self.spillCursors = []
+        self.spillOffsets = []
+        self.spilledLength = 0
+
+    def __len__(self):
+        ''' Returns the number of commands we still hold '''
+        return self.spilledLength + len(self.commands)
+
+    def __iter__(self):
+        ''' Iterates through every command we still hold, oldest first '''
+        for batchIndex in range(len(self.spillCursors)):
+            yield from self.__ReadBatch(batchIndex)
+
+        yield from self.commands
+
+    def __getitem__(self, index):
+        '''
+        Returns the command at index, or a list of them for a slice,
+        among the commands held in memory.
+        '''
+        if self.policy == "disk":
+            raise TypeError("A disk history can't be indexed; iterate "
+              "through it or use Since() instead.")
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.commands))
+
+            if step > 0:
+                return list(islice(self.commands, start, stop, step))
+
+            return [self.commands[i] for i in range(start, stop, step)]
+
+        return self.commands[index]
+
+    def __iadd__(self, commands):
+        ''' Adds commands to the history, like a list's += '''
+        self.Extend(list(commands))
+
+        return self
+
+    def Extend(self, commands):
+        ''' Adds commands to the history '''
+        self.commands.extend(commands)
+        self.cursor += len(commands)
+
+        if self.policy == "disk" and len(self.commands) >= self.spillLength:
+            self.__Spill()
+
+    def Since(self, cursor):
+        '''
+        Returns (commands, cursor): the commands added since cursor, and
+        the cursor to pass next time. Commands a ring has already
+        dropped are skipped.
+        '''
+        firstCursor = self.cursor - len(self)
+        cursor = max(cursor, firstCursor)
+
+        commands = []
+
+        # Spilled batches that hold commands past cursor
+        if self.spillCursors:
+            firstBatch = max(bisect_right(self.spillCursors, cursor) - 1, 0)
+
+            # Each batch ends where the next one, or memory, starts
+            batchEnds = self.spillCursors[1:] + [
+                self.cursor - len(self.commands)
+            ]
+
+            for batchIndex in range(firstBatch, len(self.spillCursors)):
+                if batchEnds[batchIndex] <= cursor:
+                    continue
+
+                batch = self.__ReadBatch(batchIndex)
+                skip = max(cursor - self.spillCursors[batchIndex], 0)
+                commands += batch[skip:]
+
+        # Then the commands still in memory, walking back from the newest
+        newLength = min(self.cursor - cursor, len(self.commands))
+
+        if newLength > 0:
+            newCommands = list(islice(reversed(self.commands), newLength))
+            newCommands.reverse()
+            commands += newCommands
+
+        return commands, self.cursor
+
+    def Close(self):
+        ''' Deletes the spill file, if any, and forgets its commands '''
+        if self.spillFile is not None:
+            self.spillFile.close()
+
+        self.spillFile = None
+        self.spillCursors = []
+        self.spillOffsets = []
+        self.spilledLength = 0
+
+    def __Spill(self):
+        ''' Moves the commands held in memory to the spill file '''
+        if self.spillFile is None:
+            self.spillFile = tempfile.TemporaryFile(dir=self.spillDirectory)
+
+        self.spillFile.seek(0, 2)
+
+        self.spillCursors.append(self.cursor - len(self.commands))
+        self.spillOffsets.append(self.spillFile.tell())
+
+        pickle.dump(list(self.commands), self.spillFile,
+          pickle.HIGHEST_PROTOCOL)
+
+        self.spilledLength += len(self.commands)
+        self.commands.clear()
+
+    def __ReadBatch(self, batchIndex):
+        ''' Returns the list of commands in a spilled batch '''
+        self.spillFile.seek(self.spillOffsets[batchIndex])
+
+        return pickle.load(self.spillFile)
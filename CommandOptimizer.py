@@ -0,0 +1,237 @@
+from CommandRecords import AClearCommand, AColorCommand, AMoveCommand
+from CommandRecords import APenCommand, ParseCommand
+
+class ACommandOptimizer:
+    '''
+    Shrinks a drawing pad command stream without changing the drawing.
+
+    Adjacent "MV"s are merged, moves with the pen up keep only their
+    last point, and repeated points are dropped. "PEN" and "C0" commands
+    that don't change the pen are dropped, as is a "C0" that's replaced
+    before anything is drawn with it.
+
+    Pen-down runs are then simplified with Ramer-Douglas-Peucker, dropping
+    points within tolerance of the line through their neighbours. With a
+    tolerance of 0 only points lying on that line are dropped, so the
+    drawing is exactly the same. None turns simplification off.
+
+    Like ADrawingPad, we carry the pen's state between calls. Until the
+    first "CLR" it's unknown, and nothing that depends on it is dropped.
+    '''
+    def __init__(self, tolerance=0):
+        if tolerance is not None and tolerance < 0:
+            raise ValueError("tolerance must be at least 0.")
+
+        self.tolerance = tolerance
+
+        # The pen's state as the commands we've output leave it,
+        # each None until we know it
+        self.currentPoint = None    # Current pen coordinates
+        self.penUp = None           # If the pen is currently up or not
+        self.penColor = None        # The pen's current color
+
+    def Optimize(self, commands):
+        '''
+        Returns commands, CommandRecords objects or their text form,
+        optimized as a list of CommandRecords objects.
+        '''
+        optimizedCommands = []
+
+        # Points of the "MV" run we're building
+        movePoints = []
+
+        # Color the last "C0" in optimizedCommands replaced
+        replacedColor = None
+
+        for command in commands:
+            if isinstance(command, str):
+                command = ParseCommand(command)
+
+            if isinstance(command, AMoveCommand):
+                movePoints += command.points
+                continue
+
+            if isinstance(command, APenCommand):
+                if command.up == self.penUp:
+                    continue
+
+                self.__AddMove(optimizedCommands, movePoints)
+                self.penUp = command.up
+            elif isinstance(command, AColorCommand):
+                if command.color == self.penColor:
+                    continue
+
+                self.__AddMove(optimizedCommands, movePoints)
+
+                # Nothing was drawn with the last color, so drop it
+                if (optimizedCommands and
+                  isinstance(optimizedCommands[-1], AColorCommand)):
+                    optimizedCommands.pop()
+                    self.penColor = replacedColor
+
+                    if command.color == self.penColor:
+                        continue
+
+                replacedColor = self.penColor
+                self.penColor = command.color
+            elif isinstance(command, AClearCommand):
+                self.__AddMove(optimizedCommands, movePoints)
+
+                # The same state as ADrawingPad's after "CLR"
+                self.currentPoint = (0, 0)
+                self.penUp = True
+                self.penColor = (0, 0, 0, 255)
+
+            optimizedCommands.append(command)
+
+        self.__AddMove(optimizedCommands, movePoints)
+
+        return optimizedCommands
+
+    def OptimizeOutput(self, output):
+        '''
+        Returns the output of ADrawingPad.Action, as text or records,
+        optimized as text. Action's messages are returned unchanged.
+        '''
+        if isinstance(output, str):
+            # Commands end in ";", messages don't
+            if not output.endswith(";"):
+                return output
+
+            output = output[:-1].split(";\n")
+
+        return self.ToText(self.Optimize(output))
+
+    @staticmethod
+    def ToText(commands):
+        '''
+        Returns commands as text, the way ADrawingPad.GetCommandString
+        would, or "" if there are none.
+        '''
+        if not commands:
+            return ""
+
+        return ";\n".join([str(command) for command in commands]) + ";"
+
+    def __AddMove(self, optimizedCommands, movePoints):
+        '''
+        Appends one "MV" through the run in movePoints to
+        optimizedCommands, if it moves the pen at all, and empties it.
+        '''
+        if not movePoints:
+            return
+
+        # With the pen up only the last point matters
+        if self.penUp:
+            points = movePoints[-1:]
+        else:
+            points = self.__Simplify(movePoints)
+
+        movePoints.clear()
+
+        if not points or points == [self.currentPoint]:
+            return
+
+        optimizedCommands.append(AMoveCommand(points))
+        self.currentPoint = points[-1]
+
+    def __Simplify(self, points):
+        '''
+        Returns points without repeats, simplified within our tolerance
+        starting from currentPoint.
+        '''
+        lastPoint = self.currentPoint
+        uniquePoints = []
+
+        for point in points:
+            if point != lastPoint:
+                uniquePoints.append(point)
+                lastPoint = point
+
+        if self.tolerance is None:
+            return uniquePoints
+
+        # Our run starts from currentPoint, if we know it
+        if self.currentPoint is None:
+            polyline = uniquePoints
+        else:
+            polyline = [self.currentPoint] + uniquePoints
+
+        if len(polyline) < 3:
+            return uniquePoints
+
+        keep = self.__RamerDouglasPeucker(polyline)
+        simplifiedPoints = [polyline[i] for i in range(len(polyline)) if keep[i]]
+
+        if self.currentPoint is None:
+            return simplifiedPoints
+
+        return simplifiedPoints[1:]
+
+    def __RamerDouglasPeucker(self, polyline):
+        '''
+        Returns a list of whether to keep each point of polyline.
+
+        Iterative, so long runs can't hit the recursion limit.
+        '''
+        squaredTolerance = self.tolerance * self.tolerance
+
+        keep = [False] * len(polyline)
+        keep[0] = keep[-1] = True
+
+        spans = [(0, len(polyline) - 1)]
+
+        while spans:
+            first, last = spans.pop()
+
+            farthestIndex = None
+            farthestDistance = squaredTolerance
+
+            for index in range(first + 1, last):
+                distance = self.__SquaredDistance(
+                    polyline[index], polyline[first], polyline[last]
+                )
+
+                if distance > farthestDistance:
+                    farthestIndex = index
+                    farthestDistance = distance
+
+            if farthestIndex is not None:
+                keep[farthestIndex] = True
+                spans.append((first, farthestIndex))
+                spans.append((farthestIndex, last))
+
+        return keep
+
+    @staticmethod
+    def __SquaredDistance(point, startPoint, endPoint):
+        '''
+        Returns the squared distance from point to the segment from
+        startPoint to endPoint.
+
+        To the segment rather than its line, so points the pen
+        doubles back through are never dropped.
+        '''
+        deltaX = endPoint[0] - startPoint[0]
+        deltaY = endPoint[1] - startPoint[1]
+
+        offsetX = point[0] - startPoint[0]
+        offsetY = point[1] - startPoint[1]
+
+        dot = offsetX * deltaX + offsetY * deltaY
+        squaredLength = deltaX * deltaX + deltaY * deltaY
+
+        # Nearest to startPoint
+        if dot <= 0:
+            return offsetX * offsetX + offsetY * offsetY
+
+        # Nearest to endPoint
+        if dot >= squaredLength:
+            offsetX = point[0] - endPoint[0]
+            offsetY = point[1] - endPoint[1]
+
+            return offsetX * offsetX + offsetY * offsetY
+
+        cross = offsetX * deltaY - offsetY * deltaX
+
+        return cross * cross / squaredLength
@@ -0,0 +1,114 @@
+from array import array
+
+class ACommand:
+    '''
+    Base class for a compact, structured drawing pad command.
+
+    Records only hold their decoded values. Their text form
+    (e.g. "MV (0, 0) (10, 10)") is only built by str().
+    '''
+    __slots__ = ()
+
+    # The command's opcode and name, as in ADrawingPad.kCodebook
+    kOpcode = ""
+    kName = ""
+
+    def __str__(self):
+        return self.kName
+
+    def __repr__(self):
+        return "<" + type(self).__name__ + " " + str(self) + ">"
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+
+        return all(
+            getattr(self, slot) == getattr(other, slot)
+            for slot in self.__slots__
+        )
+
+    __hash__ = None
+
+class AClearCommand(ACommand):
+    ''' "CLR" '''
+    __slots__ = ()
+
+    kOpcode = "F0"
+    kName = "CLR"
+
+class APenCommand(ACommand):
+    ''' "PEN UP" or "PEN DOWN" '''
+    __slots__ = ("up",)
+
+    kOpcode = "80"
+    kName = "PEN"
+
+    def __init__(self, up):
+        self.up = up    # True if the pen is lifted
+
+    def __str__(self):
+        return "PEN UP" if self.up else "PEN DOWN"
+
+class AColorCommand(ACommand):
+    ''' "C0 {r} {g} {b} {a}" '''
+    __slots__ = ("color",)
+
+    kOpcode = "A0"
+    kName = "C0"
+
+    def __init__(self, color):
+        self.color = tuple(color)   # (r, g, b, a)
+
+    def __str__(self):
+        return "C0 " + " ".join(str(i) for i in self.color)
+
+class AMoveCommand(ACommand):
+    ''' "MV ({x}, {y}) ..." '''
+    __slots__ = ("coordinates",)
+
+    kOpcode = "C0"
+    kName = "MV"
+
+    def __init__(self, points):
+        # Flat x, y, x, y, ... coordinates, 8 bytes each
+        self.coordinates = array('q')
+        for point in points:
+            self.coordinates.extend(point)
+
+    @property
+    def points(self):
+        ''' List of (x, y) tuples '''
+        coordinates = self.coordinates
+
+        return list(zip(coordinates[0::2], coordinates[1::2]))
+
+    @staticmethod
+    def Render(points):
+        ''' Returns the text form of a move through points '''
+        return "MV " + " ".join([str(point) for point in points])
+
+    def __str__(self):
+        return self.Render(self.points)
+
+def ParseCommand(commandText):
+    '''
+    Returns the CommandRecords object for a single command's text,
+    e.g. "MV (0, 0) (10, 10)".
+    '''
+    name, _, arguments = commandText.strip().partition(" ")
+
+    if name == "MV":
+        for separator in "(),":
+            arguments = arguments.replace(separator, " ")
+
+        numbers = [int(number) for number in arguments.split()]
+        return AMoveCommand(zip(numbers[0::2], numbers[1::2]))
+    if name == "C0":
+        return AColorCommand(int(number) for number in arguments.split())
+    if name == "PEN":
+        return APenCommand(arguments == "UP")
+    if name == "CLR":
+        return AClearCommand()
+
+    raise ValueError("Unknown command " + repr(commandText) + ".")
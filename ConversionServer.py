@@ -0,0 +1,246 @@
+from CommandHistory import ACommandHistory
+from DrawingPad import ADrawingPad
+
+from concurrent.futures import ProcessPoolExecutor
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+
+def ConvertLine(drawingPad, line):
+    '''
+    Runs drawingPad.Action over line in a worker process.
+
+    Returns (drawingPad, output), since the worker's copy of
+    drawingPad holds the state the next line depends on.
+    '''
+    return drawingPad, drawingPad.Action(line)
+
+def FeedChunk(drawingPad, chunk):
+    '''
+    Feeds chunk to drawingPad in a worker process.
+
+    Returns (drawingPad, commands), with the completed commands as text.
+    '''
+    return drawingPad, [str(command) for command in drawingPad.Feed(chunk)]
+
+class AConversionServer:
+    '''
+    Long-running asyncio server that converts hexadecimal instructions
+    streamed over TCP or a Unix socket.
+
+    Each connection is a session with its own ADrawingPad, just like each
+    file alpc2.py converts. Lines of hex get their output followed by a
+    blank line as soon as they're converted. With binaryInput, raw
+    binary instructions are streamed through Feed, and each command is
+    sent as it completes. Either way the output matches alpc2.py's.
+
+    A session doesn't read more input until its output has drained below
+    bufferSize bytes, so slow readers hold back their own writers rather
+    than filling our memory. Lines and chunks of offloadSize bytes or more
+    are converted in a pool of worker processes, so one huge session
+    doesn't stall the others.
+    '''
+    def __init__(self, workers=None, binaryInput=False, offloadSize=1 << 16,
+      bufferSize=1 << 20, maxLineLength=1 << 26, **padOptions):
+        self.workers = workers or os.cpu_count() or 1
+        self.binaryInput = binaryInput
+
+        # Bytes of input at which we convert in a worker process
+        self.offloadSize = offloadSize
+
+        # Bytes of output a session may have waiting to be sent
+        self.bufferSize = bufferSize
+
+        # Bytes a single line of hex may hold
+        self.maxLineLength = maxLineLength
+
+        # Keyword arguments for each ADrawingPad, e.g. engine="numpy"
+        self.padOptions = padOptions
+
+        self.executor = None
+
+    async def Start(self, host="127.0.0.1", port=8765, path=None):
+        '''
+        Starts listening on path if given, a Unix socket,
+        or on host and port otherwise. Returns the asyncio.Server.
+        '''
+        # Spawned rather than forked, or workers would inherit our
+        # sockets and hold connections open after we close them
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+        if path is not None:
+            return await asyncio.start_unix_server(
+                self.HandleSession, path, limit=self.maxLineLength
+            )
+
+        return await asyncio.start_server(
+            self.HandleSession, host, port, limit=self.maxLineLength
+        )
+
+    async def Serve(self, host="127.0.0.1", port=8765, path=None):
+        ''' Starts listening, and serves until cancelled '''
+        server = await self.Start(host, port, path)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.Close()
+
+    def Close(self):
+        ''' Shuts down our worker processes '''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def HandleSession(self, reader, writer):
+        '''
+        Converts everything a connection sends with a fresh ADrawingPad.
+
+        If a line fails to convert, sends "Error: " and the reason,
+        then closes the connection, like alpc2.py would stop.
+        '''
+        # Sessions only need each line's output, not the whole history
+        drawingPad = ADrawingPad(
+            history=ACommandHistory("ring", maxLength=1), **self.padOptions
+        )
+
+        # drain() waits while more than bufferSize bytes are unsent
+        writer.transport.set_write_buffer_limits(high=self.bufferSize)
+
+        try:
+            if self.binaryInput:
+                await self.__ConvertChunks(drawingPad, reader, writer)
+            else:
+                await self.__ConvertLines(drawingPad, reader, writer)
+        except ConnectionError:
+            pass
+        except ValueError as error:
+            writer.write(("Error: " + str(error) + "\n").encode())
+        finally:
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def __ConvertLines(self, drawingPad, reader, writer):
+        ''' Sends each line's output, followed by a blank line '''
+        while True:
+            line = await reader.readline()
+
+            if not line:
+                return
+
+            line = line.decode()
+
+            # Newlines the same way text-mode files read them
+            if "\r" in line:
+                line = line.replace("\r\n", "\n").replace("\r", "\n")
+
+            drawingPad, output = await self.__Run(
+                ConvertLine, drawingPad, line
+            )
+
+            writer.write((output + "\n\n").encode())
+            await writer.drain()
+
+    async def __ConvertChunks(self, drawingPad, reader, writer):
+        '''
+        Sends each command as it completes, in the same form as
+        AFileConverter.ConvertChunks.
+        '''
+        anyData = False
+        anyCommands = False
+
+        while True:
+            chunk = await reader.read(self.bufferSize)
+
+            if not chunk:
+                break
+
+            anyData = True
+
+            drawingPad, commands = await self.__Run(
+                FeedChunk, drawingPad, chunk
+            )
+
+            if commands:
+                writer.write((";\n".join(commands) + ";\n").encode())
+                anyCommands = True
+
+                await writer.drain()
+
+        commands = [str(command) for command in drawingPad.Close()]
+
+        if commands:
+            writer.write((";\n".join(commands) + ";\n\n").encode())
+        elif anyCommands:
+            writer.write(b"\n")
+        elif anyData:
+            writer.write(b"No valid commands were parsed\n\n")
+
+        await writer.drain()
+
+    async def __Run(self, function, drawingPad, data):
+        '''
+        Returns function(drawingPad, data), run in a worker process
+        if data holds offloadSize bytes or more.
+        '''
+        if len(data) < self.offloadSize or self.executor is None:
+            return function(drawingPad, data)
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            self.executor, function, drawingPad, data
+        )
+
+def Main(arguments=None):
+    '''
+    Serves drawing pad conversions over TCP or a Unix socket,
+    one ADrawingPad per connection.
+    '''
+    parser = argparse.ArgumentParser(description=Main.__doc__)
+    parser.add_argument("--host", default="127.0.0.1",
+      help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8765,
+      help="Port to listen on.")
+    parser.add_argument("--unix",
+      help="Unix socket to listen on instead of a TCP port.")
+    parser.add_argument("--workers", type=int, default=None,
+      help="Worker processes for large lines. Defaults to the CPU count.")
+    parser.add_argument("--binary-input", action="store_true",
+      help="Read raw binary instructions instead of lines of hex.")
+    parser.add_argument("--offload-size", type=int, default=1 << 16,
+      help="Bytes of input at which a worker process converts it.")
+    parser.add_argument("--buffer-size", type=int, default=1 << 20,
+      help="Bytes of output a session may have waiting to be sent.")
+    parser.add_argument("--engine", choices=ADrawingPad.kEngines,
+      default="python", help="Engine used to move the pen.")
+    parser.add_argument("--clipping", choices=("compat", "exact"),
+      default="compat", help="How segments are clipped to the pad.")
+    arguments = parser.parse_args(arguments)
+
+    conversionServer = AConversionServer(
+        arguments.workers, arguments.binary_input, arguments.offload_size,
+        arguments.buffer_size, engine=arguments.engine,
+        clipping=arguments.clipping
+    )
+
+    try:
+        asyncio.run(conversionServer.Serve(
+            arguments.host, arguments.port, arguments.unix
+        ))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    Main()
@@ -1,6 +1,19 @@
+from CommandHistory import ACommandHistory
+from CommandRecords import AClearCommand, AColorCommand, AMoveCommand
+from CommandRecords import APenCommand
 from HexDecConverter import AHexDecConverter
+from LineClipper import ALineClipper
 
-import math
+import hashlib
+import re
+import struct
+import time
+
+# NumPy is optional, and only needed for the "numpy" engine
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 class ADrawingPad:
     '''
@@ -26,25 +39,76 @@ class ADrawingPad:
     # Minimum and Maximum decoded values from bytes
     kByteValueBounds = (-8192, 8191)
 
-    def __init__(self):
+    # Engines available for the "MV" command
+    kEngines = ("python", "numpy")
+
+    # Forms our commands can be output in
+    kOutputs = ("text", "records")
+
+    # Snapshot of our state: version, currentPoint, lastPoint, penUp,
+    # outOfBounds and the number of penColor values, which follow
+    kSnapshotVersion = 1
+    kSnapshotHeader = struct.Struct("<Bqqqq??B")
+
+    def __init__(self, engine="python", clipping="compat", output="text",
+      history=None, stats=None, cache=None, verifier=None, index=None):
         # I recognize that a lot of these also fall under the "Clear()" method,
         # but I put them here again for readability
 
+        if engine not in self.kEngines:
+            raise ValueError("engine must be one of " + str(self.kEngines))
+        if engine == "numpy" and numpy is None:
+            raise ImportError("The numpy engine requires NumPy to be installed.")
+        if output not in self.kOutputs:
+            raise ValueError("output must be one of " + str(self.kOutputs))
+
+        # Engine used to move the pen: "python" or "numpy"
+        self.engine = engine
+
+        # If True, commands are kept as CommandRecords objects 
+        # and only rendered as text by GetCommandString()
+        self.recordOutput = output == "records"
+
         # Our byte encoder/decoder class from alpc1
         self.hexDecConverter = AHexDecConverter()
 
+        # Clips segments against the pad's edges: "compat" or "exact"
+        self.lineClipper = ALineClipper(
+            self.kMinMaxCoordinatePointValues, clipping
+        )
+
         self.currentPoint = (0, 0)      # Current pen coordinates
         self.lastPoint = (0, 0)         # last pen coordinates
         self.penUp = True               # If the pen is currently up or not
         self.outOfBounds = False        # If we're out of bounds
         self.penColor = (0, 0, 0, 255)  # The pen's current color
 
-        # List of all commands since the program was started
-        self.commandList = []           
+        # History of all commands since the program was started.
+        # An ACommandHistory, unbounded unless another one is given.
+        # It used to be a list: += works the same, and indexing and
+        # slicing too unless it spills to disk.
+        self.commandList = history if history is not None else ACommandHistory()
 
         # List of commands from the last time Action() was run
         self.currentCommandList = []
 
+        # An APadStats to collect counters and timings in, or None
+        self.stats = stats
+
+        # An ASegmentCache of lines that start with "CLR", or None
+        self.cache = cache
+
+        # An AShadowVerifier to check a sample of lines with, or None
+        self.verifier = verifier
+
+        # An AStrokeIndex to add the commands we build to, or None
+        self.index = index
+
+        # Streaming state carried between Feed() calls
+        self.__streamCode = None        # Opcode still collecting arguments
+        self.__streamArgs = []          # Arguments collected for it so far
+        self.__streamNibble = ""        # Odd char left over from last chunk
+
     def Action(self, hexString):
         '''
         Parses hexString for opcodes, then translates the opcodes 
@@ -52,65 +116,467 @@ class ADrawingPad:
         commands for a drawing pad program.
 
         Returns the stringified representation of the parsed commandList
-        or an error message.
-        '''
-        hexStringLength = len(hexString)
-
-        # If more than one char in hexString
-        if hexStringLength > 1:
-            # If an odd number of chars
-            if hexStringLength % 2 > 0:
-                hexString = hexString[:-1]
-            # Split the list into bytecodes
-            hexList = [
-                hexString[i] + hexString[i+1] 
-                for i in range(0, len(hexString), 2)
-            ]
-        else:
+        or an error message. If we output records, returns 
+        currentCommandList instead of stringifying it.
+
+        If we have a cache, lines that start with "CLR" are looked up in
+        it first, and hits are replayed without parsing or stats.
+
+        If we have a verifier, the lines it samples are checked against
+        the reference implementation too.
+        '''
+        if self.verifier is not None and self.verifier.Sample():
+            return self.__ActionVerified(self.__Action, hexString, hexString)
+
+        return self.__Action(hexString)
+
+    def __Action(self, hexString):
+        ''' Action, without verification '''
+        # If fewer than two chars in hexString
+        if len(hexString) < 2:
             return("Not enough arguments given.")
 
+        if self.cache is not None and self.StartsWithClear(hexString):
+            return self.__ActionCached(hexString)
+
+        if self.stats is not None:
+            self.stats.bytesRead += len(hexString) // 2
+
+        return self.__BuildCommands(self.Tokenize(hexString))
+
+    def __ActionCached(self, hexString):
+        '''
+        Same as Action, for a hexString that starts with "CLR", which
+        converts the same way whatever state we're in.
+
+        A cache entry holds the commands hexString built, our output,
+        and the state hexString left us in. Its size is the length of
+        our output, or of hexString if we output records.
+        '''
+        key = self.cache.Key(self.__CacheNamespace(), hexString)
+        entry = self.cache.Get(key)
+
+        if entry is None:
+            if self.stats is not None:
+                self.stats.bytesRead += len(hexString) // 2
+
+            output = self.__BuildCommands(self.Tokenize(hexString))
+
+            state = (self.currentPoint, self.lastPoint, self.penUp,
+              self.outOfBounds, self.penColor)
+
+            if self.recordOutput:
+                entry = (tuple(output), None, state)
+                size = len(hexString)
+            else:
+                entry = (tuple(self.currentCommandList), output, state)
+                size = len(output)
+
+            self.cache.Put(key, entry, size)
+
+            return output
+
+        commands, output, state = entry
+
+        (self.currentPoint, self.lastPoint, self.penUp,
+          self.outOfBounds, self.penColor) = state
+
+        self.currentCommandList = list(commands)
+        self.commandList.Extend(self.currentCommandList)
+
+        if self.index is not None:
+            self.index.Insert(self.currentCommandList)
+
+        if self.recordOutput:
+            return self.currentCommandList
+
+        return output
+
+    def __CacheNamespace(self):
+        '''
+        Returns what, besides a line, changes how we convert it: our
+        class and its opcode table, engine, clipping and output.
+        '''
+        padClass = type(self)
+
+        return "/".join((padClass.__module__ + "." + padClass.__qualname__,
+          self.__OpcodeDigest(), self.engine, self.lineClipper.mode,
+          "records" if self.recordOutput else "text"))
+
+    @classmethod
+    def __OpcodeDigest(cls):
+        '''
+        Returns a digest of kCodebook and kDispatch, the opcodes we parse,
+        their arity and handlers. RegisterOpcode replaces the tables, so
+        the digest is only recomputed then.
+        '''
+        digestFor = cls.__dict__.get("_ADrawingPad__opcodeDigest")
+
+        if digestFor is not None and digestFor[0] is cls.kDispatch:
+            return digestFor[1]
+
+        opcodeTable = []
+
+        for code, (name, numberOfBytes) in sorted(cls.kCodebook.items()):
+            handler, maxArgs = cls.kDispatch[code]
+
+            # Handlers without a name, like partials, fall back on repr
+            handlerName = (getattr(handler, "__module__", None),
+              getattr(handler, "__qualname__", repr(handler)))
+
+            opcodeTable.append((code, name, numberOfBytes, maxArgs,
+              handlerName))
+
+        digest = hashlib.blake2b(
+            repr(opcodeTable).encode(), digest_size=8
+        ).hexdigest()
+
+        cls.__opcodeDigest = (cls.kDispatch, digest)
+
+        return digest
+
+    @classmethod
+    def StartsWithClear(cls, hexString):
+        ''' Returns whether the first opcode in hexString is "CLR" '''
+        codebook = cls.kCodebook
+
+        for index in range(0, len(hexString) - 1, 2):
+            currentCode = hexString[index:index + 2]
+
+            if currentCode in codebook:
+                return currentCode == "F0"
+
+        return False
+
+    def ActionBytes(self, data):
+        '''
+        Same as Action, but for raw binary instructions: opcode bytes
+        from kCodebook and 7-bit argument bytes, with no hex encoding.
+
+        data may be a bytes-like object or a binary file object.
+        '''
+        if hasattr(data, "read"):
+            data = data.read()
+
+        if self.verifier is not None and self.verifier.Sample():
+            return self.__ActionVerified(
+                self.__ActionBytes, data, bytes(data).hex().upper()
+            )
+
+        return self.__ActionBytes(data)
+
+    def __ActionBytes(self, data):
+        ''' ActionBytes, without verification '''
+        # If there are no bytes in data
+        if len(data) < 1:
+            return("Not enough arguments given.")
+
+        if self.stats is not None:
+            self.stats.bytesRead += len(data)
+
+        return self.__BuildCommands(self.TokenizeBytes(data))
+
+    def __ActionVerified(self, action, data, hexString):
+        '''
+        Returns action(data), after checking it with our verifier
+        against the reference converting hexString.
+        '''
+        snapshot = self.Snapshot()
+
+        try:
+            output = action(data)
+        except Exception as error:
+            self.verifier.Verify(self, snapshot, hexString, error)
+            raise
+
+        self.verifier.Verify(self, snapshot, hexString, output)
+
+        return output
+
+    def __BuildCommands(self, tokens):
+        '''
+        Builds out each (opcode, args) span in tokens, then returns what 
+        Action returns.
+        '''
         # Resets Current Command List
         self.currentCommandList = []
 
-        # Current Opcode
-        currentCode = ""
-
-        # While there are codes in hexList
-        while len(hexList) > 0:
-            # Args to send with our command
-            hexArgs = []
-
-            try:
-                # Keep popping until we get a valid opcode
-                while currentCode not in self.kCodebook:
-                    currentCode = hexList.pop(0)
-            except:
-                pass # End of list
-
-            # If our command is CLR, don't collect arguments
-            if currentCode != "F0":
-                try:
-                    # Keep popping until there's another opcode in the queue
-                    while hexList[0] not in self.kCodebook:
-                        hexArgs.append(hexList.pop(0))
-                except:
-                    pass # End of list
-
-            # Build Our Command Out
+        # Build out each opcode span found
+        for currentCode, hexArgs in tokens:
             self.__BuildCommand(currentCode, hexArgs)
 
-            currentCode = ""
-
         # If at least one valid command was parsed
         if len(self.currentCommandList) > 0:
             # Add currentCommandList to commandList
-            self.commandList += self.currentCommandList
+            self.commandList.Extend(self.currentCommandList)
         else:
             return "No valid commands were parsed"
 
+        if self.recordOutput:
+            return self.currentCommandList
+
         # Returns our command list
         return self.GetCommandString()
 
+    def Tokenize(self, hexString):
+        '''
+        Walks hexString once, two chars at a time, and yields an
+        (opcode, hexArgs) tuple for every opcode found in kCodebook.
+
+        Bytes before the first opcode are skipped, as is a trailing
+        odd nibble. An opcode with a fixed arity in kDispatch collects at
+        most that many argument bytes, stopping early at another opcode,
+        and any bytes after them are skipped like junk. "MV" collects
+        every byte up to the next opcode.
+        '''
+        codebook = self.kCodebook
+        dispatch = self.kDispatch
+
+        # Drop the trailing odd nibble, if any
+        endIndex = len(hexString) - len(hexString) % 2
+        index = 0
+
+        while index < endIndex:
+            currentCode = hexString[index:index + 2]
+            index += 2
+
+            # Skip junk bytes until we get a valid opcode
+            if currentCode not in codebook:
+                continue
+
+            argsStart = index
+            maxArgs = dispatch[currentCode][1]
+
+            if maxArgs is None:
+                argsEnd = endIndex
+            else:
+                argsEnd = min(index + maxArgs * 2, endIndex)
+
+            # Keep going until there's another opcode or we have every arg
+            while (index < argsEnd and 
+              hexString[index:index + 2] not in codebook):
+                index += 2
+
+            hexArgs = [
+                hexString[i:i + 2] for i in range(argsStart, index, 2)
+            ]
+
+            yield currentCode, hexArgs
+
+    def TokenizeBytes(self, data):
+        '''
+        Same as Tokenize, but walks raw binary data, and yields each
+        opcode's arguments as a memoryview of data.
+        '''
+        data = memoryview(data).cast("B")
+        opcodeNames, opcodePattern = self.__OpcodeBytes()
+        dispatch = self.kDispatch
+
+        opcodeIndexes = [
+            match.start() for match in opcodePattern.finditer(data)
+        ]
+        opcodeIndexes.append(len(data))
+
+        for i in range(len(opcodeIndexes) - 1):
+            index = opcodeIndexes[i]
+            currentCode = opcodeNames[data[index]]
+
+            argsEnd = opcodeIndexes[i + 1]
+            maxArgs = dispatch[currentCode][1]
+
+            if maxArgs is not None:
+                argsEnd = min(argsEnd, index + 1 + maxArgs)
+
+            yield currentCode, data[index + 1:argsEnd]
+
+    def Feed(self, chunk):
+        '''
+        Parses the next chunk of a hex stream. Opcodes and arguments may
+        be split across chunks at any point.
+
+        Returns the list of commands completed by this chunk. A command
+        completes once the next opcode arrives, except one that takes no
+        arguments, like "CLR", which completes right away. Unlike Action(),
+        streamed commands are not added to commandList, so memory stays
+        bounded.
+
+        A bytes-like chunk is read as raw binary, like ActionBytes().
+        '''
+        codebook = self.kCodebook
+        dispatch = self.kDispatch
+
+        # Resets Current Command List
+        self.currentCommandList = []
+
+        if not isinstance(chunk, str):
+            return self.__FeedBytes(chunk)
+
+        # Most argument bytes the pending command takes, if it's fixed
+        maxArgs = None
+        if self.__streamCode is not None:
+            maxArgs = dispatch[self.__streamCode][1]
+
+        hexString = self.__streamNibble + chunk
+
+        # Hold on to a trailing odd nibble until the next chunk
+        endIndex = len(hexString) - len(hexString) % 2
+        self.__streamNibble = hexString[endIndex:]
+
+        if self.stats is not None:
+            self.stats.bytesRead += endIndex // 2
+
+        for index in range(0, endIndex, 2):
+            currentCode = hexString[index:index + 2]
+
+            # Not an opcode: an argument, or junk if we have no opcode
+            # or already have every argument
+            if currentCode not in codebook:
+                if self.__streamCode is not None and (maxArgs is None or
+                  len(self.__streamArgs) < maxArgs):
+                    self.__streamArgs.append(currentCode)
+                continue
+
+            # A new opcode completes the pending command
+            if self.__streamCode is not None:
+                self.__BuildCommand(self.__streamCode, self.__streamArgs)
+
+            self.__streamArgs = []
+            maxArgs = dispatch[currentCode][1]
+
+            # If our command takes no arguments, there are none to wait for
+            if maxArgs == 0:
+                self.__BuildCommand(currentCode)
+                self.__streamCode = None
+            else:
+                self.__streamCode = currentCode
+
+        return self.currentCommandList
+
+    def __FeedBytes(self, chunk):
+        '''
+        Feed() for a raw binary chunk.
+        '''
+        opcodeNames, opcodePattern = self.__OpcodeBytes()
+        chunk = memoryview(chunk).cast("B")
+
+        if self.stats is not None:
+            self.stats.bytesRead += len(chunk)
+
+        argsStart = 0
+
+        for match in opcodePattern.finditer(chunk):
+            index = match.start()
+
+            # A new opcode completes the pending command
+            if self.__streamCode is not None:
+                self.__CollectStreamArgs(chunk, argsStart, index)
+                self.__BuildCommand(self.__streamCode, self.__streamArgs)
+
+            currentCode = opcodeNames[chunk[index]]
+            argsStart = index + 1
+
+            # If our command takes no arguments, there are none to wait for
+            if self.kDispatch[currentCode][1] == 0:
+                self.__BuildCommand(currentCode)
+                self.__streamCode = None
+            else:
+                self.__streamCode = currentCode
+                self.__streamArgs = bytearray()
+
+        if self.__streamCode is not None:
+            self.__CollectStreamArgs(chunk, argsStart, len(chunk))
+
+        return self.currentCommandList
+
+    def __CollectStreamArgs(self, chunk, argsStart, argsEnd):
+        '''
+        Adds chunk[argsStart:argsEnd] to the pending command's arguments,
+        up to the most it takes.
+        '''
+        maxArgs = self.kDispatch[self.__streamCode][1]
+
+        if maxArgs is not None:
+            argsEnd = min(argsEnd, argsStart + maxArgs - len(self.__streamArgs))
+
+        self.__streamArgs += chunk[argsStart:argsEnd]
+
+    def Close(self):
+        '''
+        Ends the hex stream, completing any pending command and dropping
+        a trailing odd nibble.
+
+        Returns the list of commands completed.
+        '''
+        # Resets Current Command List
+        self.currentCommandList = []
+
+        if self.__streamCode is not None:
+            self.__BuildCommand(self.__streamCode, self.__streamArgs)
+
+        self.__streamCode = None
+        self.__streamArgs = []
+        self.__streamNibble = ""
+
+        return self.currentCommandList
+
+    def Stream(self, chunks):
+        '''
+        Feeds every chunk of the iterable chunks, then closes the stream.
+
+        Yields each command as soon as it's completed.
+        '''
+        for chunk in chunks:
+            yield from self.Feed(chunk)
+
+        yield from self.Close()
+
+    def __OpcodeBytes(self):
+        '''
+        Returns a dictionary of kCodebook's opcodes keyed by their
+        byte value, and a pattern matching any of those bytes.
+        '''
+        opcodeNames = {int(code, 16): code for code in self.kCodebook}
+        opcodePattern = re.compile(
+            b"[" + re.escape(bytes(sorted(opcodeNames))) + b"]"
+        )
+
+        return opcodeNames, opcodePattern
+
+    def Snapshot(self):
+        '''
+        Returns our pen's state as compact bytes, for Restore() to pick up
+        from. Lines converted after restoring give the same output as
+        they would have here.
+
+        Only state between calls to Action is kept: not our history,
+        and not a half-fed Stream().
+        '''
+        header = self.kSnapshotHeader.pack(
+            self.kSnapshotVersion, self.currentPoint[0], self.currentPoint[1],
+            self.lastPoint[0], self.lastPoint[1], self.penUp,
+            self.outOfBounds, len(self.penColor)
+        )
+
+        return header + bytes(self.penColor)
+
+    def Restore(self, snapshot):
+        ''' Sets our pen's state from a Snapshot() '''
+        headerSize = self.kSnapshotHeader.size
+
+        (version, currentX, currentY, lastX, lastY, penUp, outOfBounds,
+          colorLength) = self.kSnapshotHeader.unpack_from(snapshot)
+
+        if version != self.kSnapshotVersion:
+            raise ValueError("Unknown snapshot version " + str(version) + ".")
+        if len(snapshot) != headerSize + colorLength:
+            raise ValueError("Snapshot is the wrong size.")
+
+        self.currentPoint = (currentX, currentY)
+        self.lastPoint = (lastX, lastY)
+        self.penUp = penUp
+        self.outOfBounds = outOfBounds
+        self.penColor = tuple(snapshot[headerSize:])
+
     def GetCommandString(self, current = True):
         '''
         Returns stringified commandList or 
@@ -119,54 +585,137 @@ class ADrawingPad:
         # if current is True, send currentCommandList. Else send the full one.
         listToSend = self.currentCommandList if current else self.commandList
 
-        return ";\n".join(listToSend) + ";"
+        return ";\n".join([str(command) for command in listToSend]) + ";"
+
+    def GetCommandStringSince(self, cursor=0):
+        '''
+        Returns (commandString, cursor): the stringified commands added
+        to commandList since cursor, and the cursor to pass next time.
+
+        commandString is empty if nothing was added.
+        '''
+        commands, cursor = self.commandList.Since(cursor)
+
+        if not commands:
+            return "", cursor
+
+        commandString = ";\n".join([str(command) for command in commands])
+
+        return commandString + ";", cursor
 
     def __BuildCommand(self, command, hexArgs=[]):
         '''
-        Sends command and args out to relevant method. 
+        Sends command and args out to its handler in kDispatch. 
         
         Returns True if successful.
         '''
-        # If command is "CLR"
-        if command == "F0":
-            self.__Clear()
+        stats = self.stats
 
-        # For all other commands
-        else:
-            # Decodes our args
-            decodedArgs = self.__InterpretCodes(hexArgs)
-
-            # Remove all invalid arguments
-            decodedCommands = self.__RemoveInvalidCodes(command, decodedArgs)
-
-            # If we had valid commands after all
-            if decodedCommands != []:
-                # If command is "PEN"
-                if command == "80":
-                    # Only grab the first (and only) argument
-                    penCommand = decodedCommands[0]
-
-                    self.__SetPenUp(penCommand)
-                # If command is "C0"
-                elif command == "A0":
-                    # Convert colorCodes to a tuple
-                    colorCodes = tuple(decodedCommands)
-
-                    self.__SetColor(colorCodes)
-                # If command is "MV"
-                elif command == "C0":
-                    numberOfCommands = len(decodedCommands)
-
-                    # Re-organizes our arguments into coordinate pairs
-                    coordinates = [
-                        (decodedCommands[i], decodedCommands[i+1]) 
-                        for i in range(0, numberOfCommands, 2)
-                    ]
-
-                    self.__MovePen(coordinates)
+        if stats is not None:
+            startTime = time.perf_counter()
+            clipComputations = self.lineClipper.clipComputations
+
+        handler = self.kDispatch[command][0]
+        handler(self, hexArgs)
+
+        if stats is not None:
+            stats.AddCommand(self.kCodebook[command][0], 1 + len(hexArgs),
+              time.perf_counter() - startTime)
+            stats.clipComputations += (
+              self.lineClipper.clipComputations - clipComputations)
 
         return True
 
+    def __HandleClear(self, hexArgs):
+        ''' Handles "CLR", which takes no arguments '''
+        self.__Clear()
+
+    def __HandlePen(self, hexArgs):
+        ''' Handles "PEN" '''
+        decodedCommands = self.__DecodeValidArgs("80", hexArgs)
+
+        # If we had valid commands after all
+        if decodedCommands != []:
+            # Only grab the first (and only) argument
+            self.__SetPenUp(decodedCommands[0])
+
+    def __HandleColor(self, hexArgs):
+        ''' Handles "C0" '''
+        decodedCommands = self.__DecodeValidArgs("A0", hexArgs)
+
+        if decodedCommands != []:
+            # Convert colorCodes to a tuple
+            self.__SetColor(tuple(decodedCommands))
+
+    def __HandleMove(self, hexArgs):
+        ''' Handles "MV" '''
+        # If we move the pen in bulk
+        if self.engine == "numpy":
+            self.__MovePenNumPy(hexArgs)
+            return
+
+        decodedCommands = self.__DecodeValidArgs("C0", hexArgs)
+
+        if decodedCommands != []:
+            numberOfCommands = len(decodedCommands)
+
+            # Re-organizes our arguments into coordinate pairs
+            coordinates = [
+                (decodedCommands[i], decodedCommands[i+1]) 
+                for i in range(0, numberOfCommands, 2)
+            ]
+
+            self.__MovePen(coordinates)
+
+    def __DecodeValidArgs(self, command, hexArgs):
+        '''
+        Decodes hexArgs and returns them without the invalid ones,
+        counting those we drop.
+        '''
+        decodedArgs = self.__InterpretCodes(hexArgs)
+
+        numberOfArgs = len(decodedArgs)
+
+        # Remove all invalid arguments
+        decodedCommands = self.__RemoveInvalidCodes(command, decodedArgs)
+
+        if self.stats is not None:
+            self.stats.droppedArgs += numberOfArgs - len(decodedCommands)
+
+        return decodedCommands
+
+    @classmethod
+    def RegisterOpcode(cls, opcode, name, numberOfBytes, handler,
+      fixedArity=True):
+        '''
+        Adds opcode, two uppercase hex chars from "80" to "FF", to this
+        class's kCodebook and kDispatch. Subclasses get their own copies,
+        so registering on one leaves ADrawingPad alone. Bytes below "80"
+        are argument bytes, so they can't be opcodes.
+
+        handler is called as handler(drawingPad, hexArgs), and can use
+        drawingPad.DecodeArgs and drawingPad.AddCommand. If fixedArity is
+        True, opcode reads at most numberOfBytes argument bytes, else
+        every byte up to the next opcode.
+        '''
+        if not re.fullmatch("[0-9A-F]{2}", opcode):
+            raise ValueError("opcode must be two uppercase hex chars.")
+        if int(opcode, 16) < 0x80:
+            raise ValueError("opcode must be at least 80, as lower bytes "
+              "are arguments.")
+        if opcode in cls.kCodebook:
+            raise ValueError("Opcode " + opcode + " is already registered.")
+
+        cls.kCodebook = {**cls.kCodebook, opcode: (name, numberOfBytes)}
+        cls.kDispatch = {
+            **cls.kDispatch,
+            opcode: (handler, numberOfBytes if fixedArity else None)
+        }
+
+    def DecodeArgs(self, hexArgs):
+        ''' Returns hexArgs, as a handler gets them, decoded '''
+        return self.__InterpretCodes(hexArgs)
+
     def __Clear(self, sendToCommandList=True):
         '''
         Clears the current settings, making the current point (0,0), 
@@ -183,7 +732,7 @@ class ADrawingPad:
 
         # Sending "CLR" to the commandList is optional, but default
         if sendToCommandList:
-            self.currentCommandList.append("CLR")
+            self.AddCommand(AClearCommand())
 
         return True
 
@@ -200,8 +749,7 @@ class ADrawingPad:
 
         # Don't add "PEN UP/DOWN" to command list if nothing has changed.
         if currentPenUp != self.penUp:
-            upOrDown = "UP" if numCode == 0 else "DOWN"
-            self.currentCommandList.append("PEN " + upOrDown)
+            self.AddCommand(APenCommand(self.penUp))
 
         return True
 
@@ -224,10 +772,9 @@ class ADrawingPad:
 
         # Sets the color
         self.penColor = colorCodes
-        colorValueString = " ".join(str(i) for i in colorCodes)
 
         # Appends command to our list
-        self.currentCommandList.append("C0 " + colorValueString)
+        self.AddCommand(AColorCommand(colorCodes))
 
         return True
 
@@ -242,186 +789,262 @@ class ADrawingPad:
 
         Returns True if successful
         '''
-        # Building our command
-        currentCommand = "MV"
+        lineClipper = self.lineClipper
+        (minX, maxX), (minY, maxY) = self.kMinMaxCoordinatePointValues
 
-        # Set our last point to
-        self.lastPoint = self.currentPoint
+        # Points of the move we're building
+        movePoints = []
 
         # Iterates through all of our coordinate pairs
         for coordinatePair in coordinatePairsList:
             currentlyOutOfBounds = self.outOfBounds
 
-            # Gets weighted coordinatePair
-            weightedCoordinates = self.__WeighCoordinates(
-                coordinatePair
-            )
+            # Set last point to current point
+            self.lastPoint = self.currentPoint
 
             # Sets currentPoint to the absolutePoint
-            self.currentPoint = (coordinatePair[0] + self.currentPoint[0], 
-              coordinatePair[1] + self.currentPoint[1])
+            self.currentPoint = (coordinatePair[0] + self.lastPoint[0], 
+              coordinatePair[1] + self.lastPoint[1])
 
-            # If the weighted point differs from the absolute point
-            if weightedCoordinates != self.currentPoint:
-                self.outOfBounds = True
-            else:
-                self.outOfBounds = False
+            # Trivial accept: most points land inside the pad
+            self.outOfBounds = not (minX <= self.currentPoint[0] <= maxX and
+              minY <= self.currentPoint[1] <= maxY)
 
             # If going out of or coming back in bounds
             if self.outOfBounds != currentlyOutOfBounds:
+                if self.stats is not None:
+                    self.stats.outOfBoundsTransitions += 1
+
                 # If the pen isn't already up
                 if not self.penUp:
                     # If now out of bounds
                     if self.outOfBounds:
                         # Append coordinates to our current command
-                        currentCommand += " " + str(weightedCoordinates)
+                        movePoints.append(lineClipper.WeighEnd(
+                            self.lastPoint, self.currentPoint
+                        ))
 
-                        self.currentCommandList.append(currentCommand)
-                        self.currentCommandList.append("PEN UP")
+                        self.__AddMove(movePoints)
+                        self.AddCommand(APenCommand(True))
                     else:
                         # Coordinates upon re-entry
-                        reEntryCoordinates = self.__WeighCoordinates(
-                            self.lastPoint, False
-                        )
-                        # Append coordinates to our current command
-                        currentCommand += " " + str(reEntryCoordinates)
+                        movePoints.append(lineClipper.WeighReEntry(
+                            self.lastPoint, self.currentPoint
+                        ))
 
-                        self.currentCommandList.append(currentCommand)
-                        self.currentCommandList.append("PEN DOWN")
+                        self.__AddMove(movePoints)
+                        self.AddCommand(APenCommand(False))
                     
-                    currentCommand = "MV"
+                    movePoints = []
             
             # If in bounds and the pen is down, 
-            # append weighted coordinates to current command
+            # append coordinates to current command
             if not self.outOfBounds and not self.penUp:
-                currentCommand += " " + str(weightedCoordinates)
-
-            # Set last point to current point
-            self.lastPoint = self.currentPoint
+                movePoints.append(self.currentPoint)
 
         # If the pen isn't down or we're out of bounds
         if self.penUp or self.outOfBounds:
-            currentCommand += " " + str(weightedCoordinates)
+            movePoints.append(lineClipper.WeighEnd(
+                self.lastPoint, self.currentPoint
+            ))
+
+        self.lastPoint = self.currentPoint
             
         # If we have coordinates in it, add the command to command list
-        if currentCommand != "MV":
-            self.currentCommandList.append(currentCommand)
+        if movePoints:
+            self.__AddMove(movePoints)
 
         return True
 
-    def __WeighCoordinates(self, 
-      unweightedCoordinates, testCurrentPoint=True):
+    def __MovePenNumPy(self, hexArgs):
         ''' 
-        Modifies coordinates based on kMinMaxCoordinatePointValues
-        and returns the result.
+        Same as __MovePen, but decodes, validates and moves through the
+        whole argument run with NumPy arrays instead of one coordinate
+        pair at a time. Only segments that cross the pad's edges
+        are clipped individually.
+
+        Returns True if successful
         '''
         minMaxValues = self.kMinMaxCoordinatePointValues
+        byteValueBounds = self.kByteValueBounds
 
-        # Absolute coordinates
-        absoluteX = unweightedCoordinates[0] + self.currentPoint[0]
-        absoluteY = unweightedCoordinates[1] + self.currentPoint[1]
-
-        # Setting up our weighted coordinates
-        weightedX = absoluteX
-        weightedY = absoluteY
-        weightedCoordinates = [weightedX, weightedY]
-
-        # If we have a vertical or horizontal line between our coordinates
-        if (absoluteX == self.currentPoint[0] or 
-          absoluteY == self.currentPoint[1]):
-            # If x is out of bounds in the negative direction
-            if absoluteX < minMaxValues[0][0]:
-                weightedCoordinates[0] = minMaxValues[0][0]
-            # If x is out of bounds in the positive direction
-            elif absoluteX > minMaxValues[0][1]:
-                weightedCoordinates[0] = minMaxValues[0][1]
-            # If y is out of bounds in the negative direction
-            if absoluteY < minMaxValues[1][0]:
-                weightedCoordinates[1] = minMaxValues[1][0]
-            # If y is out of bounds in the positive direction
-            elif absoluteY > minMaxValues[1][1]:
-                weightedCoordinates[1] = minMaxValues[1][1]
-        # If it's a diagonal line
-        else:
-            currentPoint = self.currentPoint
-
-            unweightedX = unweightedCoordinates[0]
-            unweightedY = unweightedCoordinates[1]
-
-            weightedX = absoluteX
-            weightedY = absoluteY
-
-            try:
-                # Get our tangent
-                tangent = ((unweightedY) / (unweightedX))
-            except: # Can't divide by 0
-                tangent = 1
-
-            # If x is out of bounds in the negative direction
-            if absoluteX < minMaxValues[0][0]:
-                weightedX = minMaxValues[0][0]
-                if testCurrentPoint:
-                    weightedY = math.ceil(currentPoint[0] + 
-                    (minMaxValues[0][0] - currentPoint[0]) * tangent)
-                else:
-                    weightedY = math.ceil((minMaxValues[0][0] - 
-                      currentPoint[0]) * tangent * 2)
-            # If x is out of bounds in the positive direction
-            elif absoluteX > minMaxValues[0][1]:
-                weightedX = minMaxValues[0][1]
-                if testCurrentPoint:
-                    weightedY = math.ceil(currentPoint[0] + 
-                    (minMaxValues[0][1] - currentPoint[0]) * tangent)
+        deltas = self.__InterpretCodesNumPy(hexArgs)
+        numberOfArgs = deltas.size
+
+        # Keep only the values before the first invalid one
+        invalidIndexes = numpy.flatnonzero(
+          (deltas < byteValueBounds[0]) | (deltas > byteValueBounds[1]))
+        if invalidIndexes.size > 0:
+            deltas = deltas[:invalidIndexes[0]]
+
+        # Our coordinates must come in pairs
+        numberOfPairs = deltas.size // 2
+
+        if self.stats is not None:
+            self.stats.droppedArgs += numberOfArgs - numberOfPairs * 2
+
+        if numberOfPairs == 0:
+            return True
+
+        deltas = deltas[:numberOfPairs * 2].reshape(numberOfPairs, 2)
+
+        # Absolute points, starting from our current point
+        points = numpy.cumsum(deltas, axis=0) + self.currentPoint
+
+        # Which of our points are out of bounds
+        outOfBoundsMask = (
+          (points[:, 0] < minMaxValues[0][0]) | 
+          (points[:, 0] > minMaxValues[0][1]) | 
+          (points[:, 1] < minMaxValues[1][0]) | 
+          (points[:, 1] > minMaxValues[1][1]))
+
+        # Python ints, so our points match the python engine's
+        pointList = [tuple(point) for point in points.tolist()]
+        outOfBoundsList = outOfBoundsMask.tolist()
+
+        firstPoint = self.currentPoint
+
+        if self.stats is not None:
+            self.stats.outOfBoundsTransitions += int(
+              outOfBoundsList[0] != self.outOfBounds) + int(numpy.count_nonzero(
+              outOfBoundsMask[1:] != outOfBoundsMask[:-1]))
+
+        def StartOf(i):
+            ''' Returns the point segment i starts from '''
+            return pointList[i - 1] if i > 0 else firstPoint
+
+        def WeighSegment(i):
+            ''' Returns the weighted end point of segment i '''
+            if not outOfBoundsList[i]:
+                return pointList[i]
+            return self.lineClipper.WeighEnd(StartOf(i), pointList[i])
+
+        movePoints = []
+
+        # If the pen is down, we draw every in-bounds point,
+        # and lift and lower the pen where we cross the edges
+        if not self.penUp:
+            previousMask = numpy.empty_like(outOfBoundsMask)
+            previousMask[0] = self.outOfBounds
+            previousMask[1:] = outOfBoundsMask[:-1]
+            crossings = numpy.flatnonzero(outOfBoundsMask != previousMask)
+
+            runStart = 0
+
+            for i in crossings.tolist() + [numberOfPairs]:
+                # Every point in [runStart, i) is either in or out of bounds
+                if runStart < i and not outOfBoundsList[runStart]:
+                    movePoints += pointList[runStart:i]
+
+                if i == numberOfPairs:
+                    break
+
+                # If now out of bounds
+                if outOfBoundsList[i]:
+                    movePoints.append(WeighSegment(i))
+
+                    self.__AddMove(movePoints)
+                    self.AddCommand(APenCommand(True))
                 else:
-                    weightedY = math.ceil((minMaxValues[0][1] - 
-                      currentPoint[0]) * tangent * 2)
-            # If y is out of bounds in the negative direction
-            elif absoluteY < minMaxValues[1][0]:
-                weightedY = minMaxValues[1][0]
-                
-                try:
-                    weightedX = math.ceil(currentPoint[1] + 
-                      (minMaxValues[1][0] - currentPoint[1]) / tangent)
-                except: # Can't divide by 0
-                    weightedX = weightedX
-            # If y is out of bounds in the positive direction
-            elif absoluteY > minMaxValues[1][1]:
-                weightedY = minMaxValues[1][1]
-                
-                try:
-                    weightedX = math.ceil(currentPoint[1] + 
-                      (minMaxValues[1][1] - currentPoint[1]) / tangent)
-                except: # Can't divide by 0
-                    weightedX = weightedX
-
-            weightedCoordinates = [weightedX, weightedY]
-        
-        return tuple(weightedCoordinates)
+                    # Coordinates upon re-entry
+                    reEntryCoordinates = self.lineClipper.WeighReEntry(
+                        StartOf(i), pointList[i]
+                    )
+                    movePoints.append(reEntryCoordinates)
+
+                    self.__AddMove(movePoints)
+                    self.AddCommand(APenCommand(False))
+
+                movePoints = []
+                runStart = i
+
+        self.outOfBounds = outOfBoundsList[-1]
+
+        # If the pen isn't down or we're out of bounds
+        if self.penUp or self.outOfBounds:
+            movePoints.append(WeighSegment(numberOfPairs - 1))
+
+        self.currentPoint = pointList[-1]
+        self.lastPoint = self.currentPoint
+
+        # If we have coordinates in it, add the command to command list
+        if movePoints:
+            self.__AddMove(movePoints)
+
+        return True
+
+    def AddCommand(self, command):
+        '''
+        Appends a CommandRecords command to currentCommandList,
+        stringified unless we output records.
+
+        Handlers of registered opcodes emit their commands with this.
+        '''
+        if self.index is not None:
+            self.index.Add(command)
+
+        if not self.recordOutput:
+            command = str(command)
+
+        self.currentCommandList.append(command)
+
+    def __AddMove(self, movePoints):
+        '''
+        Appends "MV" through movePoints to currentCommandList.
+        '''
+        if self.index is not None:
+            self.index.AddMove(movePoints)
+
+        if self.recordOutput:
+            self.currentCommandList.append(AMoveCommand(movePoints))
+        else:
+            self.currentCommandList.append(AMoveCommand.Render(movePoints))
 
     def __InterpretCodes(self, hexCodes):
         ''' 
         Interprets hexCodes and returns a list of decoded decimal numbers.
         '''
-        numberOfCodes = len(hexCodes)
-
-        # Will hold all of our decoded decimal arguments
-        decodedCommands = []
-
-        # If we have an odd number of codes
-        if numberOfCodes % 2 > 0 and numberOfCodes > 0:
-            hexCodes.pop()
-            numberOfCodes = len(hexCodes)
+        # Raw binary arguments are decoded as they are
+        if isinstance(hexCodes, list):
+            hexCodes = "".join(hexCodes)
 
-        # If we have two or more codes
-        if numberOfCodes > 0:
-            # Get a list of decoded arguments using our pairs
-            decodedCommands = [
-                self.hexDecConverter.Decode(hexCodes[i], hexCodes[i+1]) 
-                for i in range(0, numberOfCodes, 2) 
-            ]
+        # Decode the whole run in one call. An odd trailing code is dropped.
+        decodedCommands = self.hexDecConverter.DecodeMany(hexCodes)
         
         return decodedCommands
 
+    def __InterpretCodesNumPy(self, hexCodes):
+        ''' 
+        Interprets hexCodes and returns a NumPy array of decoded 
+        decimal numbers.
+        '''
+        # Raw binary arguments need no hex decoding
+        if not isinstance(hexCodes, list):
+            codes = numpy.frombuffer(hexCodes, dtype=numpy.uint8)
+            codes = codes[:codes.size - codes.size % 2].astype(numpy.int64)
+
+            return ((codes[0::2] << 7) | codes[1::2]) - 8192
+
+        hexString = "".join(hexCodes)
+
+        # Drop any trailing partial number
+        hexString = hexString[:len(hexString) - len(hexString) % 4]
+
+        try:
+            hexBytes = bytes.fromhex(hexString)
+        except ValueError:
+            hexBytes = b""
+
+        # Anything bytes.fromhex can't read exactly goes through our converter
+        if len(hexBytes) * 2 != len(hexString):
+            return numpy.array(
+                self.hexDecConverter.DecodeMany(hexString), dtype=numpy.int64
+            )
+
+        codes = numpy.frombuffer(hexBytes, dtype=numpy.uint8).astype(numpy.int64)
+
+        return ((codes[0::2] << 7) | codes[1::2]) - 8192
+
     def __RemoveInvalidCodes(self, command, decimalArgs):
         ''' 
         Removes invalid codes from decimalArgs and returns the updated list.
@@ -473,4 +1096,13 @@ class ADrawingPad:
                     break
 
         return decimalArgs
-    
\ No newline at end of file
+
+    # Dispatch table: each opcode's handler, and the most argument bytes it
+    # reads, or None to read every byte up to the next opcode.
+    # It's down here so the handlers above already exist.
+    kDispatch = {
+        "F0": (__HandleClear, kCodebook["F0"][1]),
+        "80": (__HandlePen, kCodebook["80"][1]),
+        "A0": (__HandleColor, kCodebook["A0"][1]),
+        "C0": (__HandleMove, None)
+    }
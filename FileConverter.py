@@ -0,0 +1,411 @@
+from BatchConverter import ABatchConverter
+from CommandHistory import ACommandHistory
+from DrawingPad import ADrawingPad
+
+import gzip
+import io
+import mmap
+import os
+import pickle
+import sys
+
+class AFileConverter:
+    '''
+    Converts files of hexadecimal instructions, one line at a time,
+    writing each line's output followed by a blank line.
+
+    Regular input files are memory-mapped and decoded in large blocks.
+    Output is gathered into bufferSize-char writes. "-" means stdin or
+    stdout, and ".gz" paths are gzipped unless told otherwise.
+
+    Raw binary input has no lines, so it's converted serially as one
+    stream, giving the same output as a single line of hex would.
+
+    If given an APadStats, every drawing pad's stats are collected in it.
+    If given an ACommandOptimizer, the output is optimized with it. If
+    given an ASegmentCache, lines are looked up in it when converting
+    serially.
+
+    Serial conversions of regular files can save a checkpoint about every
+    checkpointInterval bytes of input, and resume from it after a crash
+    with the same output an uninterrupted run would give. Resuming with
+    other pad or optimizer settings raises ValueError.
+    '''
+    def __init__(self, workers=1, chunkSize=256, bufferSize=1 << 20,
+      stats=None, optimizer=None, cache=None, checkpointInterval=1 << 26,
+      **padOptions):
+        self.workers = workers
+        self.chunkSize = chunkSize
+        self.stats = stats
+        self.optimizer = optimizer
+        self.cache = cache
+        self.checkpointInterval = checkpointInterval
+
+        # Chars of input to decode, and of output to write, at once
+        self.bufferSize = bufferSize
+
+        # Keyword arguments for each ADrawingPad, e.g. engine="numpy"
+        self.padOptions = padOptions
+
+    def Convert(self, inPath, outPath, gzipInput=None, gzipOutput=None,
+      binaryInput=False, checkpointPath=None):
+        '''
+        Converts inPath to outPath. gzipInput and gzipOutput default to
+        whether their path ends in ".gz". If binaryInput is True, inPath
+        holds raw binary instructions instead of lines of hex.
+
+        If checkpointPath is given, converts resumably with it.
+        '''
+        if checkpointPath is not None:
+            if gzipInput or gzipOutput or binaryInput:
+                raise ValueError("Only plain lines of hex can be "
+                  "converted resumably.")
+
+            self.ConvertResumable(inPath, outPath, checkpointPath)
+            return
+
+        if gzipOutput is None:
+            gzipOutput = outPath.endswith(".gz")
+
+        outFile = self.__OpenOutput(outPath, gzipOutput)
+
+        try:
+            if binaryInput:
+                outputs = self.ConvertChunks(self.ReadChunks(inPath, gzipInput))
+            else:
+                outputs = self.ConvertLines(self.ReadLines(inPath, gzipInput))
+
+            self.WriteBuffered(outputs, outFile)
+        finally:
+            if outFile is sys.stdout:
+                outFile.flush()
+            else:
+                outFile.close()
+
+    def ConvertResumable(self, inPath, outPath, checkpointPath):
+        '''
+        Converts inPath to outPath serially, saving a checkpoint to
+        checkpointPath about every checkpointInterval bytes of input.
+
+        If checkpointPath already holds a checkpoint for inPath, picks up
+        from it: outPath is cut back to where the checkpoint was saved,
+        and the drawing pad restored to its state then. The checkpoint
+        is deleted once the whole file is converted.
+        '''
+        if self.workers > 1:
+            raise ValueError("Only serial conversions are resumable.")
+        if "-" in (inPath, outPath) or inPath.endswith(".gz") or \
+          outPath.endswith(".gz"):
+            raise ValueError("Only regular, uncompressed files can be "
+              "converted resumably.")
+
+        # We only need each line's output, not the whole history
+        drawingPad = ADrawingPad(
+            history=ACommandHistory("ring", maxLength=1), stats=self.stats,
+            cache=self.cache, **self.padOptions
+        )
+
+        inputStat = os.stat(inPath)
+        inputId = (os.path.abspath(inPath), inputStat.st_size,
+          inputStat.st_mtime_ns)
+
+        settings = self.__CheckpointSettings(drawingPad)
+
+        checkpoint = self.LoadCheckpoint(checkpointPath, inputId, settings)
+
+        if checkpoint is None:
+            inputOffset = 0
+            outFile = open(outPath, "w")
+        else:
+            inputOffset = checkpoint["inputOffset"]
+            drawingPad.Restore(checkpoint["padState"])
+
+            # Same settings, so only the optimizer's pen needs restoring
+            if self.optimizer is not None:
+                vars(self.optimizer).update(vars(checkpoint["optimizer"]))
+
+            outFile = open(outPath, "r+")
+
+            if os.fstat(outFile.fileno()).st_size < checkpoint["outputOffset"]:
+                outFile.close()
+                raise ValueError(outPath + " is shorter than its checkpoint.")
+
+            outFile.seek(checkpoint["outputOffset"])
+            outFile.truncate()
+
+        with outFile, open(inPath, "rb") as inFile:
+            # Empty files can't be mapped
+            if inputStat.st_size > 0:
+                mappedFile = mmap.mmap(
+                    inFile.fileno(), 0, access=mmap.ACCESS_READ
+                )
+
+                with mappedFile:
+                    lastCheckpoint = inputOffset
+                    interval = self.checkpointInterval
+
+                    for blockEnd, block in self.__ReadMappedBlocks(
+                      mappedFile, inputOffset):
+                        self.WriteBuffered(self.__ConvertLines(
+                            drawingPad, self.__SplitLines(block)
+                        ), outFile)
+
+                        if blockEnd - lastCheckpoint >= interval:
+                            outFile.flush()
+                            os.fsync(outFile.fileno())
+
+                            self.SaveCheckpoint(checkpointPath, {
+                                "input": inputId,
+                                "settings": settings,
+                                "inputOffset": blockEnd,
+                                "outputOffset": outFile.tell(),
+                                "padState": drawingPad.Snapshot(),
+                                "optimizer": self.optimizer
+                            })
+
+                            lastCheckpoint = blockEnd
+
+        if os.path.exists(checkpointPath):
+            os.remove(checkpointPath)
+
+    def LoadCheckpoint(self, checkpointPath, inputId, settings=None):
+        '''
+        Returns the checkpoint saved at checkpointPath, or None if there's
+        none. Raises ValueError if it was saved for another input, or, if
+        settings are given, with other pad or optimizer settings.
+        '''
+        if not os.path.exists(checkpointPath):
+            return None
+
+        with open(checkpointPath, "rb") as checkpointFile:
+            checkpoint = pickle.load(checkpointFile)
+
+        if checkpoint["input"] != inputId:
+            raise ValueError(checkpointPath + " was saved for another input, "
+              "or the input has changed since.")
+        if settings is not None and checkpoint.get("settings") != settings:
+            raise ValueError(checkpointPath + " was saved with other "
+              "settings: " + repr(checkpoint.get("settings")) + ".")
+
+        return checkpoint
+
+    def SaveCheckpoint(self, checkpointPath, checkpoint):
+        ''' Writes checkpoint to checkpointPath, replacing it in one step '''
+        temporaryPath = checkpointPath + ".tmp"
+
+        with open(temporaryPath, "wb") as checkpointFile:
+            pickle.dump(checkpoint, checkpointFile, pickle.HIGHEST_PROTOCOL)
+            checkpointFile.flush()
+            os.fsync(checkpointFile.fileno())
+
+        os.replace(temporaryPath, checkpointPath)
+
+    def ReadLines(self, inPath, gzipInput=None):
+        ''' Yields each line of inPath, newline included '''
+        if gzipInput is None:
+            gzipInput = inPath.endswith(".gz")
+
+        # Streams we can't map
+        if inPath == "-" or gzipInput:
+            inFile = sys.stdin.buffer if inPath == "-" else open(inPath, "rb")
+
+            if gzipInput:
+                inFile = gzip.open(inFile, "rb")
+
+            with io.TextIOWrapper(inFile) as textFile:
+                yield from textFile
+
+            return
+
+        with open(inPath, "rb") as inFile:
+            # Empty files can't be mapped
+            if os.fstat(inFile.fileno()).st_size == 0:
+                return
+
+            mappedFile = mmap.mmap(
+                inFile.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+            with mappedFile:
+                yield from self.__ReadMappedLines(mappedFile)
+
+    def ReadChunks(self, inPath, gzipInput=None):
+        ''' Yields inPath's raw bytes in chunks of about bufferSize '''
+        if gzipInput is None:
+            gzipInput = inPath.endswith(".gz")
+
+        inFile = sys.stdin.buffer if inPath == "-" else open(inPath, "rb")
+
+        if gzipInput:
+            inFile = gzip.open(inFile, "rb")
+
+        with inFile:
+            chunk = inFile.read(self.bufferSize)
+
+            while chunk:
+                yield chunk
+                chunk = inFile.read(self.bufferSize)
+
+    def ConvertChunks(self, chunks):
+        '''
+        Streams raw binary chunks through one ADrawingPad, and yields
+        the output as commands complete.
+        '''
+        drawingPad = ADrawingPad(stats=self.stats, **self.padOptions)
+
+        anyData = False
+        anyCommands = False
+
+        for chunk in chunks:
+            anyData = anyData or len(chunk) > 0
+
+            for command in self.__Optimize(drawingPad.Feed(chunk)):
+                yield (";\n" if anyCommands else "") + str(command)
+                anyCommands = True
+
+        for command in self.__Optimize(drawingPad.Close()):
+            yield (";\n" if anyCommands else "") + str(command)
+            anyCommands = True
+
+        # Same as Action's output for one line
+        if anyCommands:
+            yield ";\n\n"
+        elif anyData:
+            yield "No valid commands were parsed\n\n"
+
+    def ConvertLines(self, lines):
+        ''' Yields the output for lines, serially or in a process pool '''
+        if self.workers > 1:
+            batchConverter = ABatchConverter(
+                self.workers, self.chunkSize, self.stats, self.optimizer,
+                **self.padOptions
+            )
+            yield from batchConverter.ConvertLines(lines)
+            return
+
+        # We only need each line's output, not the whole history
+        drawingPad = ADrawingPad(
+            history=ACommandHistory("ring", maxLength=1), stats=self.stats,
+            cache=self.cache, **self.padOptions
+        )
+
+        yield from self.__ConvertLines(drawingPad, lines)
+
+    def WriteBuffered(self, outputs, outFile):
+        '''
+        Writes outputs to outFile in writes of about bufferSize chars.
+
+        If a line fails to convert, the output before it is still written.
+        '''
+        buffer = []
+        bufferLength = 0
+
+        try:
+            for output in outputs:
+                buffer.append(output)
+                bufferLength += len(output)
+
+                if bufferLength >= self.bufferSize:
+                    outFile.write("".join(buffer))
+                    buffer = []
+                    bufferLength = 0
+        finally:
+            if buffer:
+                outFile.write("".join(buffer))
+
+    def __ConvertLines(self, drawingPad, lines):
+        ''' Yields the output for lines, converted by drawingPad '''
+        optimizer = self.optimizer
+
+        for line in lines:
+            output = drawingPad.Action(line)
+
+            if optimizer is not None:
+                output = optimizer.OptimizeOutput(output)
+
+            yield output + "\n\n"
+
+    def __CheckpointSettings(self, drawingPad):
+        '''
+        Returns the settings that change our output, which a conversion
+        must keep to resume from a checkpoint.
+        '''
+        optimizerSettings = None
+        if self.optimizer is not None:
+            optimizerSettings = {"tolerance": self.optimizer.tolerance}
+
+        return {
+            "padOptions": {
+                "engine": drawingPad.engine,
+                "clipping": drawingPad.lineClipper.mode,
+                "output": "records" if drawingPad.recordOutput else "text"
+            },
+            "optimizer": optimizerSettings
+        }
+
+    def __Optimize(self, commands):
+        '''
+        Returns commands optimized with our optimizer, if we have one.
+
+        Only commands from the same chunk can be merged.
+        '''
+        if self.optimizer is None:
+            return commands
+
+        return self.optimizer.Optimize(commands)
+
+    def __OpenOutput(self, outPath, gzipOutput):
+        ''' Opens outPath for writing text '''
+        if outPath == "-":
+            if gzipOutput:
+                return gzip.open(sys.stdout.buffer, "wt")
+            return sys.stdout
+
+        if gzipOutput:
+            return gzip.open(outPath, "wt")
+
+        return open(outPath, "w")
+
+    def __ReadMappedLines(self, mappedFile):
+        '''
+        Yields each line of mappedFile, decoding blocks of about
+        bufferSize bytes that end on a newline.
+        '''
+        for blockEnd, block in self.__ReadMappedBlocks(mappedFile):
+            yield from self.__SplitLines(block)
+
+    def __ReadMappedBlocks(self, mappedFile, blockStart=0):
+        '''
+        Yields (blockEnd, block) for each block of mappedFile from
+        blockStart on: about bufferSize bytes ending on a newline,
+        decoded, and the offset just past it.
+        '''
+        fileSize = len(mappedFile)
+
+        while blockStart < fileSize:
+            blockEnd = mappedFile.rfind(
+                b"\n", blockStart, blockStart + self.bufferSize
+            ) + 1
+
+            # No newline in this block: read on until the next one
+            if blockEnd == 0:
+                blockEnd = mappedFile.find(b"\n", blockStart) + 1 or fileSize
+
+            block = mappedFile[blockStart:blockEnd].decode()
+            blockStart = blockEnd
+
+            # Newlines the same way text-mode files read them
+            if "\r" in block:
+                block = block.replace("\r\n", "\n").replace("\r", "\n")
+
+            yield blockEnd, block
+
+    def __SplitLines(self, block):
+        ''' Yields each line of block, newline included '''
+        lineStart = 0
+        blockLength = len(block)
+
+        while lineStart < blockLength:
+            lineEnd = block.find("\n", lineStart) + 1 or blockLength
+            yield block[lineStart:lineEnd]
+            lineStart = lineEnd
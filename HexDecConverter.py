@@ -1,11 +1,21 @@
-import sys
-
 class AHexDecConverter:
     '''
-        Converts and encodes 14-bit decimal numbers to hexadecimal and 
+        Converts and encodes 14-bit decimal numbers to hexadecimal and
         decodes hexadecimal representations to 14-bit decimal numbers.
+
+        Invalid input raises a TypeError or ValueError.
     '''
 
+    # 4-character hexadecimal representations, indexed by decimal number + 8192
+    kEncodeTable = tuple(
+        '{:02X}{:02X}'.format(i >> 7, i & 0x7f) for i in range(16384)
+    )
+
+    # Decimal numbers, keyed by their 4-character hexadecimal representation
+    kDecodeTable = {
+        hexCode: i - 8192 for i, hexCode in enumerate(kEncodeTable)
+    }
+
     def CheckHex(self, hexcode):
         ''' Returns whether a two-char hexcode is valid or not '''
         hexString = str(hexcode)
@@ -32,42 +42,70 @@ class AHexDecConverter:
             Takes two bytes in the range [0x00..0x7F] and decodes them to a decimal representation.
         '''
 
+        # Fast path: a valid pair of uppercase hexcodes is already in our table
+        if isinstance(hi, str) and isinstance(lo, str) and len(hi) == 2:
+            decNum = self.kDecodeTable.get(hi + lo)
+            if decNum is not None:
+                return decNum
+
         # Ensures hexcodes are valid
-        try:
-            hiBool = self.CheckHex(hi)
-            loBool = self.CheckHex(lo)
-            if not(hiBool and loBool):
-                raise ValueError("Decodable Hi and Lo hex values must each be represented by two characters between '00' and 'ff.'")
-        except ValueError as error:
-            sys.exit("ValueError: " + str(error))
-        except Exception as e:
-            sys.exit("Error: " + str(e))
+        if not (self.CheckHex(hi) and self.CheckHex(lo)):
+            raise ValueError("Decodable Hi and Lo hex values must each be represented by two characters between '00' and 'ff.'")
 
         # Converts each decimal to integer, and shifts the hi byte left by 7 bits
-        hi, lo = int(hi, 16) << 7, int(lo, 16) 
+        hi, lo = int(hi, 16) << 7, int(lo, 16)
 
         # Returns the Combined bytes, where 8192 is subtracted so we're back in our signed range
-        return (hi | lo) - 8192 
+        return (hi | lo) - 8192
+
+    def DecodeMany(self, codes):
+        '''
+            Decodes a whole run of arguments in one call and returns a list of decimal numbers.
+
+            codes may either be raw bytes (a bytes-like object, two bytes per number)
+            or a hexadecimal string (four characters per number). A trailing partial
+            number is dropped.
+        '''
+
+        # Hexadecimal string: look each 4-char code up, falling back to Decode
+        if isinstance(codes, str):
+            decodeTable = self.kDecodeTable
+            decodedNumbers = []
+
+            for i in range(0, len(codes) - 3, 4):
+                hexCode = codes[i:i+4]
+                decNum = decodeTable.get(hexCode)
+
+                if decNum is None:
+                    decNum = self.Decode(hexCode[:2], hexCode[2:])
+
+                decodedNumbers.append(decNum)
+
+            return decodedNumbers
+
+        # Raw bytes: pair up each hi and lo byte
+        codes = memoryview(codes).cast('B')
+
+        return [
+            ((hi << 7) | lo) - 8192 for hi, lo in zip(codes[0::2], codes[1::2])
+        ]
 
     def Encode(self, decNum):
-        ''' 
-            Removes sign from a given decimal, splits it into two bytes, 
-            drops each byte's most significant bit (MSB), 
+        '''
+            Removes sign from a given decimal, splits it into two bytes,
+            drops each byte's most significant bit (MSB),
             then returns the 4-character representation of the number in hexadecimal format.
         '''
 
+        # Fast path: in-range integers are already in our table
+        if type(decNum) is int and -8192 <= decNum < 8192:
+            return self.kEncodeTable[decNum + 8192]
+
         # step 0: Ensures decimal number is actually an integer and is within range
-        try:
-            if not isinstance(decNum, int):
-                raise TypeError("Encodable number must be an integer.")
-            if not self.CheckDec(decNum):
-                raise ValueError("Encodable number must be an integer between -8192 and 8192.")
-        except TypeError as error:
-            sys.exit("TypeError: " + str(error))
-        except ValueError as error:
-            sys.exit("ValueError: " + str(error))
-        except Exception as error:
-            sys.exit("Error: " + str(error))
+        if not isinstance(decNum, int):
+            raise TypeError("Encodable number must be an integer.")
+        if not self.CheckDec(decNum):
+            raise ValueError("Encodable number must be an integer between -8192 and 8192.")
 
         # step 1: adds 8192 to the decimal to make it unsigned
         decNum += 8192
@@ -80,3 +118,19 @@ class AHexDecConverter:
 
         # step 3: return 4-character representation
         return (hi + lo)
+
+    def EncodeMany(self, decNums):
+        '''
+            Encodes every number in the iterable decNums and returns
+            their concatenated 4-character representations.
+        '''
+        encodeTable = self.kEncodeTable
+        hexCodes = []
+
+        for decNum in decNums:
+            if type(decNum) is int and -8192 <= decNum < 8192:
+                hexCodes.append(encodeTable[decNum + 8192])
+            else:
+                hexCodes.append(self.Encode(decNum))
+
+        return "".join(hexCodes)
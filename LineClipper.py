@@ -0,0 +1,246 @@
+import math
+
+class ALineClipper:
+    '''
+    Clips pen segments against the drawing pad's edges.
+
+    "compat" mode reproduces the original float-based weighting,
+    rounding included. "exact" mode clips with Cohen-Sutherland
+    outcodes and integer Liang-Barsky, rounding to the nearest point.
+    '''
+    # Clipping modes
+    kModes = ("compat", "exact")
+
+    # Cohen-Sutherland outcode bits
+    kInside = 0
+    kLeft = 1
+    kRight = 2
+    kBottom = 4
+    kTop = 8
+
+    def __init__(self, minMaxCoordinatePointValues, mode="compat"):
+        if mode not in self.kModes:
+            raise ValueError("mode must be one of " + str(self.kModes))
+
+        self.mode = mode
+
+        # ((x-min, x-max), (y-min, y-max))
+        self.minMaxCoordinatePointValues = minMaxCoordinatePointValues
+
+        # Number of segments we've had to clip
+        self.clipComputations = 0
+
+    def OutCode(self, point):
+        '''
+        Returns the Cohen-Sutherland outcode of point.
+        0 means point is inside the pad.
+        '''
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+        x, y = point
+
+        outCode = self.kInside
+
+        if x < minX:
+            outCode |= self.kLeft
+        elif x > maxX:
+            outCode |= self.kRight
+        if y < minY:
+            outCode |= self.kBottom
+        elif y > maxY:
+            outCode |= self.kTop
+
+        return outCode
+
+    def WeighEnd(self, startPoint, endPoint):
+        '''
+        Returns where the segment from startPoint to endPoint
+        should stop on the pad.
+
+        That is endPoint itself if it's inside the pad.
+        '''
+        # Trivial accept: the end point is on the pad
+        if self.OutCode(endPoint) == self.kInside:
+            return endPoint
+
+        self.clipComputations += 1
+
+        if self.mode == "compat":
+            unweightedCoordinates = (endPoint[0] - startPoint[0],
+              endPoint[1] - startPoint[1])
+
+            return self.__WeighCompat(startPoint, unweightedCoordinates)
+
+        tEntry, tExit = self.__LiangBarsky(startPoint, endPoint)
+
+        # If the segment never touches the pad, stop at the nearest point
+        if tEntry is None:
+            return self.__Clamp(endPoint)
+
+        return self.__PointAt(startPoint, endPoint, tExit)
+
+    def WeighReEntry(self, startPoint, endPoint):
+        '''
+        Returns where the segment from the out-of-bounds startPoint
+        to the in-bounds endPoint comes back onto the pad.
+        '''
+        self.clipComputations += 1
+
+        if self.mode == "compat":
+            # The original re-entry formula weighs startPoint
+            # as if it were relative to endPoint
+            return self.__WeighCompat(endPoint, startPoint, False)
+
+        tEntry, tExit = self.__LiangBarsky(startPoint, endPoint)
+
+        # endPoint is on the pad, so this only guards bad input
+        if tEntry is None:
+            return self.__Clamp(endPoint)
+
+        return self.__PointAt(startPoint, endPoint, tEntry)
+
+    def Clip(self, startPoint, endPoint):
+        '''
+        Returns the (startPoint, endPoint) part of the segment that lies
+        on the pad, rounded to the nearest points, or None if it misses.
+
+        Always exact, whatever our mode.
+        '''
+        tEntry, tExit = self.__LiangBarsky(startPoint, endPoint)
+
+        if tEntry is None:
+            return None
+
+        self.clipComputations += 1
+
+        return (self.__PointAt(startPoint, endPoint, tEntry),
+          self.__PointAt(startPoint, endPoint, tExit))
+
+    def __Clamp(self, point):
+        ''' Returns the point on the pad closest to point '''
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+
+        return (min(max(point[0], minX), maxX), min(max(point[1], minY), maxY))
+
+    def __LiangBarsky(self, startPoint, endPoint):
+        '''
+        Returns the (tEntry, tExit) parameters of the part of the segment
+        that lies on the pad, each as a (numerator, denominator) pair of
+        integers with a positive denominator.
+
+        Returns (None, None) if the segment misses the pad.
+        '''
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+
+        deltaX = endPoint[0] - startPoint[0]
+        deltaY = endPoint[1] - startPoint[1]
+
+        # t is inside [tEntry, tExit], starting with the whole segment
+        tEntry = (0, 1)
+        tExit = (1, 1)
+
+        # Each edge constrains p * t <= q
+        edges = (
+            (-deltaX, startPoint[0] - minX),
+            (deltaX, maxX - startPoint[0]),
+            (-deltaY, startPoint[1] - minY),
+            (deltaY, maxY - startPoint[1])
+        )
+
+        for p, q in edges:
+            # Parallel to this edge
+            if p == 0:
+                if q < 0:
+                    return None, None
+                continue
+
+            # t = q / p, with a positive denominator
+            t = (q, p) if p > 0 else (-q, -p)
+
+            # Entering this edge: raise tEntry
+            if p < 0:
+                if t[0] * tEntry[1] > tEntry[0] * t[1]:
+                    tEntry = t
+            # Leaving this edge: lower tExit
+            elif t[0] * tExit[1] < tExit[0] * t[1]:
+                tExit = t
+
+            if tEntry[0] * tExit[1] > tExit[0] * tEntry[1]:
+                return None, None
+
+        return tEntry, tExit
+
+    def __PointAt(self, startPoint, endPoint, t):
+        '''
+        Returns the point at t along the segment,
+        rounded to the nearest integer coordinates.
+        '''
+        numerator, denominator = t
+
+        return tuple(
+            start + (2 * (end - start) * numerator + denominator)
+              // (2 * denominator)
+            for start, end in zip(startPoint, endPoint)
+        )
+
+    def __WeighCompat(self, currentPoint,
+      unweightedCoordinates, testCurrentPoint=True):
+        '''
+        The original __WeighCoordinates formula, rounding included.
+
+        Modifies coordinates based on minMaxCoordinatePointValues
+        and returns the result.
+        '''
+        minMaxValues = self.minMaxCoordinatePointValues
+
+        unweightedX = unweightedCoordinates[0]
+        unweightedY = unweightedCoordinates[1]
+
+        # Absolute coordinates
+        absoluteX = unweightedX + currentPoint[0]
+        absoluteY = unweightedY + currentPoint[1]
+
+        weightedX = absoluteX
+        weightedY = absoluteY
+
+        # If we have a vertical or horizontal line between our coordinates
+        if unweightedX == 0 or unweightedY == 0:
+            weightedX = min(max(absoluteX, minMaxValues[0][0]),
+              minMaxValues[0][1])
+            weightedY = min(max(absoluteY, minMaxValues[1][0]),
+              minMaxValues[1][1])
+
+            return (weightedX, weightedY)
+
+        # It's a diagonal line, so neither of these can be 0
+        tangent = unweightedY / unweightedX
+
+        # If x is out of bounds in the negative direction
+        if absoluteX < minMaxValues[0][0]:
+            weightedX = minMaxValues[0][0]
+            if testCurrentPoint:
+                weightedY = math.ceil(currentPoint[0] +
+                  (minMaxValues[0][0] - currentPoint[0]) * tangent)
+            else:
+                weightedY = math.ceil((minMaxValues[0][0] -
+                  currentPoint[0]) * tangent * 2)
+        # If x is out of bounds in the positive direction
+        elif absoluteX > minMaxValues[0][1]:
+            weightedX = minMaxValues[0][1]
+            if testCurrentPoint:
+                weightedY = math.ceil(currentPoint[0] +
+                  (minMaxValues[0][1] - currentPoint[0]) * tangent)
+            else:
+                weightedY = math.ceil((minMaxValues[0][1] -
+                  currentPoint[0]) * tangent * 2)
+        # If y is out of bounds in the negative direction
+        elif absoluteY < minMaxValues[1][0]:
+            weightedY = minMaxValues[1][0]
+            weightedX = math.ceil(currentPoint[1] +
+              (minMaxValues[1][0] - currentPoint[1]) / tangent)
+        # If y is out of bounds in the positive direction
+        elif absoluteY > minMaxValues[1][1]:
+            weightedY = minMaxValues[1][1]
+            weightedX = math.ceil(currentPoint[1] +
+              (minMaxValues[1][1] - currentPoint[1]) / tangent)
+
+        return (weightedX, weightedY)
@@ -0,0 +1,73 @@
+class APadStats:
+    '''
+    Counters and timings an ADrawingPad collects when it's given one.
+
+    Commands are keyed by name, e.g. "MV". skippedBytes counts the input
+    bytes that were neither an opcode nor an argument, once every
+    command has been built.
+    '''
+    def __init__(self):
+        self.commandCounts = {}         # Commands built, by name
+        self.commandSeconds = {}        # Time spent building them, by name
+        self.bytesRead = 0              # Input bytes given to the pad
+        self.bytesUsed = 0              # Opcode and argument bytes built
+        self.droppedArgs = 0            # Decoded args found invalid
+        self.outOfBoundsTransitions = 0 # Times the pen left or re-entered
+        self.clipComputations = 0       # Segments clipped to the pad
+
+    @property
+    def skippedBytes(self):
+        ''' Input bytes skipped as junk '''
+        return self.bytesRead - self.bytesUsed
+
+    def AddCommand(self, name, numberOfBytes, seconds):
+        ''' Counts a command built from numberOfBytes in seconds '''
+        self.commandCounts[name] = self.commandCounts.get(name, 0) + 1
+        self.commandSeconds[name] = self.commandSeconds.get(name, 0) + seconds
+        self.bytesUsed += numberOfBytes
+
+    def Merge(self, other):
+        ''' Adds other's counters and timings to ours '''
+        for name, count in other.commandCounts.items():
+            self.commandCounts[name] = self.commandCounts.get(name, 0) + count
+        for name, seconds in other.commandSeconds.items():
+            self.commandSeconds[name] = self.commandSeconds.get(name, 0) + seconds
+
+        self.bytesRead += other.bytesRead
+        self.bytesUsed += other.bytesUsed
+        self.droppedArgs += other.droppedArgs
+        self.outOfBoundsTransitions += other.outOfBoundsTransitions
+        self.clipComputations += other.clipComputations
+
+    def ToDict(self):
+        ''' Returns our counters and timings as a dictionary '''
+        return {
+            "commandCounts": dict(self.commandCounts),
+            "commandSeconds": dict(self.commandSeconds),
+            "bytesRead": self.bytesRead,
+            "skippedBytes": self.skippedBytes,
+            "droppedArgs": self.droppedArgs,
+            "outOfBoundsTransitions": self.outOfBoundsTransitions,
+            "clipComputations": self.clipComputations
+        }
+
+    def Summary(self):
+        ''' Returns a human-readable summary '''
+        lines = []
+
+        for name in sorted(self.commandCounts):
+            lines.append("{:<4} {:>12,} commands {:>10.3f}s".format(
+              name, self.commandCounts[name], self.commandSeconds[name]))
+
+        counters = (
+            ("Bytes read", self.bytesRead),
+            ("Junk bytes skipped", self.skippedBytes),
+            ("Invalid args dropped", self.droppedArgs),
+            ("Out-of-bounds transitions", self.outOfBoundsTransitions),
+            ("Clip computations", self.clipComputations)
+        )
+
+        for label, count in counters:
+            lines.append("{:<26} {:>12,}".format(label + ":", count))
+
+        return "\n".join(lines)
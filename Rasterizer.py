@@ -0,0 +1,418 @@
+from CommandRecords import AClearCommand, AColorCommand, AMoveCommand
+from CommandRecords import ACommand, APenCommand, ParseCommand
+from DrawingPad import ADrawingPad
+from LineClipper import ALineClipper
+
+import argparse
+import struct
+import tempfile
+import zlib
+
+# NumPy is optional for the converter, but rendering needs it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class ARasterizer:
+    '''
+    Renders ADrawingPad output onto an RGBA canvas of the whole pad, held
+    in square tiles in a memory-mapped file.
+
+    Only the tiles strokes touch are allocated, so a sparse drawing takes
+    a few megabytes of the file rather than the pad's full gigabyte.
+    Pen-down "MV" segments are stepped through together with NumPy, giving
+    Bresenham's pixels with ties rounded up, and painted in the pen's
+    color without blending. Channels outside 0-255 are clamped, and a
+    color without alpha is opaque. "CLR" empties the canvas.
+
+    With a scale above 1 we draw a thumbnail: coordinates are divided by
+    scale before stepping, so time and memory shrink with the canvas.
+
+    The canvas' top left is the pad's (x-min, y-max), so y grows upwards
+    like on the pad. Tiles go in a temporary file unless path is given.
+    '''
+    # Width and height of a tile, in pixels
+    kTileSize = 256
+
+    # Most pixels we step through at once
+    kBatchPixels = 1 << 20
+
+    # Most points of a pen-down run we hold before drawing them
+    kMaxRunLength = 1 << 16
+
+    def __init__(self, scale=1, path=None, tileSize=kTileSize):
+        if numpy is None:
+            raise ImportError("The rasterizer requires NumPy to be installed.")
+        if scale < 1:
+            raise ValueError("scale must be at least 1.")
+        if tileSize < 1:
+            raise ValueError("tileSize must be at least 1.")
+
+        self.scale = scale
+        self.tileSize = tileSize
+
+        # ((x-min, x-max), (y-min, y-max))
+        self.minMaxCoordinatePointValues = (
+            ADrawingPad.kMinMaxCoordinatePointValues
+        )
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+
+        self.lineClipper = ALineClipper(
+            self.minMaxCoordinatePointValues, "exact"
+        )
+
+        # Canvas size in pixels, and in tiles
+        self.width = (maxX - minX) // scale + 1
+        self.height = (maxY - minY) // scale + 1
+        self.tilesAcross = -(-self.width // tileSize)
+        self.tilesDown = -(-self.height // tileSize)
+
+        # Each tile's slot in tiles, or -1 if it's not allocated
+        self.tileTable = numpy.full(
+            (self.tilesDown, self.tilesAcross), -1, dtype=numpy.int64
+        )
+
+        # Number of slots in use, and in the file
+        self.tileCount = 0
+        self.tileCapacity = 16
+
+        if path is None:
+            self.tileFile = tempfile.TemporaryFile()
+        else:
+            self.tileFile = open(path, "w+b")
+
+        self.tiles = self.__MapTiles()
+
+        # The pen's state, as ADrawingPad starts it
+        self.currentPoint = (0, 0)      # Current pen coordinates
+        self.penUp = True               # If the pen is currently up or not
+        self.penColor = (0, 0, 0, 255)  # The pen's current color
+
+        # Points of the pen-down run we're building
+        self.runPoints = []
+
+    @property
+    def allocatedBytes(self):
+        ''' Bytes of the file our allocated tiles take '''
+        return self.tileCount * self.tileSize * self.tileSize * 4
+
+    def Draw(self, commands):
+        ''' Draws commands, CommandRecords objects or their text form '''
+        for command in commands:
+            if isinstance(command, str):
+                command = ParseCommand(command)
+
+            if isinstance(command, AMoveCommand):
+                points = command.points
+
+                if not points:
+                    continue
+
+                if not self.penUp:
+                    if not self.runPoints:
+                        self.runPoints.append(self.currentPoint)
+
+                    self.runPoints += points
+
+                    if len(self.runPoints) >= self.kMaxRunLength:
+                        self.__DrawRun()
+
+                self.currentPoint = points[-1]
+                continue
+
+            self.__DrawRun()
+
+            if isinstance(command, APenCommand):
+                self.penUp = command.up
+            elif isinstance(command, AColorCommand):
+                self.penColor = command.color
+            elif isinstance(command, AClearCommand):
+                self.Clear()
+
+        self.__DrawRun()
+
+    def DrawOutput(self, output):
+        '''
+        Draws output: what ADrawingPad.Action returned, as text or
+        records, or the lines of a file alpc2.py wrote. Messages
+        are skipped.
+        '''
+        if isinstance(output, str):
+            output = output.split("\n")
+
+        self.Draw(self.__Commands(output))
+
+    def Clear(self):
+        ''' Empties the canvas and resets the pen, like "CLR" '''
+        self.runPoints = []
+
+        # Slots are reused, and zeroed as they're allocated again
+        self.tileTable.fill(-1)
+        self.tileCount = 0
+
+        self.currentPoint = (0, 0)
+        self.penUp = True
+        self.penColor = (0, 0, 0, 255)
+
+    def GetPixels(self):
+        '''
+        Returns the whole canvas as a (height, width, 4) array.
+
+        This holds every pixel in memory, so it's meant for thumbnails.
+        '''
+        return numpy.concatenate(
+            [self.__Band(tileRow) for tileRow in range(self.tilesDown)]
+        )
+
+    def SavePNG(self, path):
+        ''' Writes the canvas to path as a PNG, one row of tiles at a time '''
+        with open(path, "wb") as pngFile:
+            pngFile.write(b"\x89PNG\r\n\x1a\n")
+
+            # 8 bits per channel, RGBA, no interlacing
+            self.__WriteChunk(pngFile, b"IHDR", struct.pack(
+                ">IIBBBBB", self.width, self.height, 8, 6, 0, 0, 0
+            ))
+
+            compressor = zlib.compressobj()
+
+            for tileRow in range(self.tilesDown):
+                band = self.__Band(tileRow)
+
+                # Each row starts with its filter type, 0 for none
+                rows = numpy.zeros(
+                    (band.shape[0], self.width * 4 + 1), dtype=numpy.uint8
+                )
+                rows[:, 1:] = band.reshape(band.shape[0], -1)
+
+                data = compressor.compress(rows.tobytes())
+
+                if data:
+                    self.__WriteChunk(pngFile, b"IDAT", data)
+
+            self.__WriteChunk(pngFile, b"IDAT", compressor.flush())
+            self.__WriteChunk(pngFile, b"IEND", b"")
+
+    def Close(self):
+        ''' Closes our tile file, deleting it if it's temporary '''
+        if self.tileFile is not None:
+            self.tiles.flush()
+            self.tiles = None
+
+            self.tileFile.close()
+            self.tileFile = None
+
+    def __Commands(self, output):
+        ''' Yields the commands in output, skipping messages '''
+        for command in output:
+            if isinstance(command, ACommand):
+                yield command
+                continue
+
+            command = command.strip()
+
+            # Commands end in ";", messages don't
+            if command.endswith(";"):
+                yield command[:-1]
+
+    def __MapTiles(self):
+        ''' Returns tileCapacity tiles mapped from our file, growing it '''
+        tileSize = self.tileSize
+
+        return numpy.memmap(
+            self.tileFile, dtype=numpy.uint8, mode="r+",
+            shape=(self.tileCapacity, tileSize, tileSize, 4)
+        )
+
+    def __DrawRun(self):
+        ''' Draws the pen-down run in runPoints, and empties it '''
+        if len(self.runPoints) < 2:
+            self.runPoints = []
+            return
+
+        points = numpy.array(self.runPoints, dtype=numpy.int64)
+        self.runPoints = []
+
+        startPoints = points[:-1]
+        endPoints = points[1:]
+
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+
+        onPad = ((minX <= points[:, 0]) & (points[:, 0] <= maxX) &
+          (minY <= points[:, 1]) & (points[:, 1] <= maxY))
+        inside = onPad[:-1] & onPad[1:]
+
+        # Clip the few segments that leave the pad, one at a time
+        if not inside.all():
+            clippedSegments = [
+                self.lineClipper.Clip(tuple(startPoint), tuple(endPoint))
+                for startPoint, endPoint in zip(
+                    startPoints[~inside].tolist(), endPoints[~inside].tolist()
+                )
+            ]
+            clippedSegments = numpy.array(
+                [segment for segment in clippedSegments if segment is not None],
+                dtype=numpy.int64
+            ).reshape(-1, 2, 2)
+
+            startPoints = numpy.concatenate(
+                (startPoints[inside], clippedSegments[:, 0])
+            )
+            endPoints = numpy.concatenate(
+                (endPoints[inside], clippedSegments[:, 1])
+            )
+
+        self.__Step(self.__ToPixels(startPoints), self.__ToPixels(endPoints))
+
+    def __ToPixels(self, points):
+        ''' Returns pad points as (column, row) pixels of the canvas '''
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+
+        pixels = numpy.empty_like(points)
+        pixels[:, 0] = (points[:, 0] - minX) // self.scale
+        pixels[:, 1] = (maxY - points[:, 1]) // self.scale
+
+        return pixels
+
+    def __Step(self, startPixels, endPixels):
+        '''
+        Paints the segments from startPixels to endPixels, in batches
+        of about kBatchPixels pixels.
+        '''
+        deltas = endPixels - startPixels
+        lengths = numpy.abs(deltas).max(axis=1)
+        counts = lengths + 1
+        countEnds = numpy.cumsum(counts)
+
+        first = 0
+
+        while first < counts.size:
+            # The segments whose pixels fit in this batch, at least one
+            last = int(numpy.searchsorted(
+                countEnds, countEnds[first] - counts[first] + self.kBatchPixels,
+                "right"
+            ))
+            last = max(last, first + 1)
+
+            self.__StepBatch(startPixels[first:last], deltas[first:last],
+              lengths[first:last], counts[first:last])
+
+            first = last
+
+    def __StepBatch(self, startPixels, deltas, lengths, counts):
+        '''
+        Paints every pixel of the segments at once.
+
+        Pixel i of a segment lengths steps long along its major axis is
+        startPixel + round(i * delta / length), in integers.
+        '''
+        segments = numpy.repeat(numpy.arange(counts.size), counts)
+        steps = numpy.arange(segments.size) - (
+            numpy.cumsum(counts) - counts
+        )[segments]
+
+        lengths = lengths[segments, None]
+        divisors = 2 * numpy.maximum(lengths, 1)
+
+        pixels = startPixels[segments] + (
+            2 * steps[:, None] * deltas[segments] + lengths
+        ) // divisors
+
+        self.__Paint(pixels[:, 0], pixels[:, 1])
+
+    def __Paint(self, columns, rows):
+        ''' Paints the pixels at columns and rows in our pen's color '''
+        tileSize = self.tileSize
+        tileTable = self.tileTable.reshape(-1)
+
+        keys = (rows // tileSize) * self.tilesAcross + columns // tileSize
+        slots = tileTable[keys]
+
+        missingKeys = numpy.unique(keys[slots < 0])
+
+        if missingKeys.size:
+            self.__AllocateTiles(missingKeys)
+            slots = tileTable[keys]
+
+        color = numpy.clip(self.penColor, 0, 255)
+
+        # A color without alpha is opaque
+        if color.size < 4:
+            color = numpy.append(color, [255] * (4 - color.size))
+
+        self.tiles[slots, rows % tileSize, columns % tileSize] = color[:4]
+
+    def __AllocateTiles(self, keys):
+        ''' Gives the tiles at keys in tileTable fresh, blank slots '''
+        tileCount = self.tileCount + keys.size
+
+        if tileCount > self.tileCapacity:
+            self.tiles.flush()
+
+            self.tileCapacity = max(self.tileCapacity * 2, tileCount)
+            self.tiles = self.__MapTiles()
+
+        slots = numpy.arange(self.tileCount, tileCount)
+
+        self.tileTable.reshape(-1)[keys] = slots
+        self.tiles[self.tileCount:tileCount] = 0
+
+        self.tileCount = tileCount
+
+    def __Band(self, tileRow):
+        ''' Returns the pixels of a row of tiles, cropped to the canvas '''
+        tileSize = self.tileSize
+
+        band = numpy.zeros(
+            (tileSize, self.tilesAcross * tileSize, 4), dtype=numpy.uint8
+        )
+
+        for tileColumn in numpy.flatnonzero(self.tileTable[tileRow] >= 0):
+            slot = self.tileTable[tileRow, tileColumn]
+            left = tileColumn * tileSize
+
+            band[:, left:left + tileSize] = self.tiles[slot]
+
+        return band[:self.height - tileRow * tileSize, :self.width]
+
+    @staticmethod
+    def __WriteChunk(pngFile, chunkType, data):
+        ''' Writes a PNG chunk of chunkType holding data '''
+        pngFile.write(struct.pack(">I", len(data)))
+        pngFile.write(chunkType)
+        pngFile.write(data)
+        pngFile.write(struct.pack(">I", zlib.crc32(chunkType + data)))
+
+def Main(arguments=None):
+    '''
+    Renders a file of drawing pad commands, as alpc2.py writes them,
+    to a PNG.
+    '''
+    parser = argparse.ArgumentParser(description=Main.__doc__)
+    parser.add_argument("input", nargs="?", default="output.txt",
+      help="File of commands to render. Defaults to output.txt.")
+    parser.add_argument("output", nargs="?", default="preview.png",
+      help="PNG to write. Defaults to preview.png.")
+    parser.add_argument("--scale", type=int, default=1,
+      help="Pad units per pixel. Above 1 renders a smaller thumbnail.")
+    parser.add_argument("--tile-size", type=int, default=ARasterizer.kTileSize,
+      help="Width and height of a tile, in pixels.")
+    parser.add_argument("--tiles-file",
+      help="File to keep tiles in. Defaults to a temporary file.")
+    arguments = parser.parse_args(arguments)
+
+    rasterizer = ARasterizer(
+        arguments.scale, arguments.tiles_file, arguments.tile_size
+    )
+
+    try:
+        with open(arguments.input) as inFile:
+            rasterizer.DrawOutput(inFile)
+
+        rasterizer.SavePNG(arguments.output)
+    finally:
+        rasterizer.Close()
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+
+import hashlib
+import os
+import pickle
+
+class ASegmentCache:
+    '''
+    LRU cache of converted segments, keyed by a hash of their contents.
+
+    "CLR" resets all of a drawing pad's state, so a line whose first
+    opcode is "CLR" always converts the same way. ADrawingPad stores what
+    such a line built, and the state it left the pad in, and replays it
+    on a hit without parsing anything.
+
+    Entries are dropped oldest first once there are more than maxEntries
+    of them, or their sizes add up to more than maxBytes. Either bound
+    may be None. If path is given, entries are loaded from it and Save()
+    writes them back.
+    '''
+    def __init__(self, maxEntries=4096, maxBytes=None, path=None):
+        if maxEntries is not None and maxEntries < 1:
+            raise ValueError("maxEntries must be at least 1.")
+        if maxBytes is not None and maxBytes < 1:
+            raise ValueError("maxBytes must be at least 1.")
+
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.path = path
+
+        # Key: (entry, size), least recently used first
+        self.entries = OrderedDict()
+        self.totalBytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None and os.path.exists(path):
+            self.Load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @staticmethod
+    def Key(namespace, segment):
+        '''
+        Returns the key for segment, a str or bytes-like object.
+
+        namespace tells apart pads that convert the same
+        segment differently, e.g. with another engine.
+        '''
+        if isinstance(segment, str):
+            segment = segment.encode()
+
+        digest = hashlib.blake2b(namespace.encode(), digest_size=16)
+        digest.update(b"\0")
+        digest.update(segment)
+
+        return digest.digest()
+
+    def Get(self, key):
+        ''' Returns the entry for key, or None, and counts a hit or miss '''
+        item = self.entries.get(key)
+
+        if item is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return item[0]
+
+    def Put(self, key, entry, size):
+        '''
+        Stores entry under key, taking about size bytes, then drops
+        entries until we're within our bounds again.
+        '''
+        if key in self.entries:
+            self.totalBytes -= self.entries.pop(key)[1]
+
+        self.entries[key] = (entry, size)
+        self.totalBytes += size
+
+        while self.entries and (
+          (self.maxEntries is not None and
+            len(self.entries) > self.maxEntries) or
+          (self.maxBytes is not None and self.totalBytes > self.maxBytes)):
+            self.totalBytes -= self.entries.popitem(last=False)[1][1]
+
+    def Clear(self):
+        ''' Drops every entry and resets our counters '''
+        self.entries.clear()
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def ToDict(self):
+        ''' Returns our counters as a dictionary '''
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": len(self.entries),
+            "bytes": self.totalBytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0
+        }
+
+    def Summary(self):
+        ''' Returns a human-readable summary of our counters '''
+        counters = self.ToDict()
+
+        return ("Segment cache: {:,} hits, {:,} misses ({:.1%}), "
+          "{:,} entries, {:,} bytes").format(counters["hits"],
+          counters["misses"], counters["hitRate"], counters["entries"],
+          counters["bytes"])
+
+    def Load(self):
+        ''' Reads entries from path, ahead of the ones we already hold '''
+        with open(self.path, "rb") as cacheFile:
+            loadedEntries = pickle.load(cacheFile)
+
+        for key, item in self.entries.items():
+            loadedEntries[key] = item
+
+        self.entries = OrderedDict()
+        self.totalBytes = 0
+
+        for key, (entry, size) in loadedEntries.items():
+            self.Put(key, entry, size)
+
+    def Save(self):
+        ''' Writes our entries to path, replacing it in one step '''
+        if self.path is None:
+            raise ValueError("This cache has no path to save to.")
+
+        temporaryPath = self.path + ".tmp"
+
+        with open(temporaryPath, "wb") as cacheFile:
+            pickle.dump(self.entries, cacheFile, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporaryPath, self.path)
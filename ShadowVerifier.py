@@ -0,0 +1,356 @@
+from DrawingPad import ADrawingPad
+from HexDecConverter import AHexDecConverter
+from ReferencePad import AReferencePad
+
+import argparse
+import random
+import sys
+
+class AShadowVerifier:
+    '''
+    Checks a sample of the lines an ADrawingPad converts against
+    AReferencePad, the original implementation.
+
+    Each sampled line is converted again by a reference pad starting
+    from the same state. If the output or the state it leaves differ,
+    we record a divergence: the line, the state before it, both outputs,
+    and the smallest part of the line that still diverges.
+
+    Lines the reference itself fails on, like trailing junk, can't be
+    checked and are only counted. Only "compat" clipping is the
+    reference's behaviour, so "exact" can't be verified.
+    '''
+    # State a line is converted from, and must leave the same
+    kStateNames = ("currentPoint", "lastPoint", "penUp", "outOfBounds",
+      "penColor")
+
+    def __init__(self, sampleRate=1.0, seed=None, maxDivergences=100,
+      maxTests=2000):
+        if not 0 <= sampleRate <= 1:
+            raise ValueError("sampleRate must be between 0 and 1.")
+
+        self.sampleRate = sampleRate
+        self.random = random.Random(seed)
+
+        # Most divergences we keep, and conversions we minimize one with
+        self.maxDivergences = maxDivergences
+        self.maxTests = maxTests
+
+        self.verified = 0
+        self.referenceErrors = 0
+        self.divergenceCount = 0
+
+        # The first maxDivergences divergences, as dictionaries
+        self.divergences = []
+
+    def Sample(self):
+        ''' Returns whether to verify the next line '''
+        return self.sampleRate >= 1 or self.random.random() < self.sampleRate
+
+    def Verify(self, drawingPad, snapshot, hexString, output):
+        '''
+        Checks what drawingPad output for hexString, starting from
+        snapshot, against the reference. output is an exception if
+        converting raised one.
+
+        Returns whether they match, or None if the reference failed.
+        '''
+        if drawingPad.lineClipper.mode != "compat":
+            raise ValueError("Only compat clipping can be verified.")
+
+        self.verified += 1
+
+        referenceResult = self.__Reference(snapshot, hexString)
+
+        if referenceResult is None:
+            self.referenceErrors += 1
+            return None
+
+        result = (self.__Text(output), self.__State(drawingPad))
+
+        if result == referenceResult:
+            return True
+
+        self.divergenceCount += 1
+
+        if len(self.divergences) < self.maxDivergences:
+            engine = drawingPad.engine
+
+            self.divergences.append({
+                "line": hexString,
+                "minimalLine": self.Minimize(snapshot, hexString, engine),
+                "snapshot": snapshot,
+                "engine": engine,
+                "output": result[0],
+                "referenceOutput": referenceResult[0]
+            })
+
+        return False
+
+    def Diverges(self, snapshot, hexString, engine="python"):
+        '''
+        Returns whether a fresh pad with engine, starting from snapshot,
+        converts hexString differently than the reference does.
+        '''
+        referenceResult = self.__Reference(snapshot, hexString)
+
+        if referenceResult is None:
+            return False
+
+        drawingPad = ADrawingPad(engine=engine)
+        drawingPad.Restore(snapshot)
+
+        try:
+            output = drawingPad.Action(hexString)
+        except Exception as error:
+            output = error
+
+        result = (self.__Text(output), self.__State(drawingPad))
+
+        return result != referenceResult
+
+    def Minimize(self, snapshot, hexString, engine="python"):
+        '''
+        Returns the smallest part of hexString we find that still
+        diverges from snapshot, removing runs of byte pairs with delta
+        debugging. Gives up after maxTests conversions.
+
+        Returns hexString itself if a fresh pad doesn't diverge on it,
+        e.g. when only a cached line did.
+        '''
+        if not self.Diverges(snapshot, hexString, engine):
+            return hexString
+
+        # Byte pairs, so removing some never shifts the others
+        units = [hexString[i:i + 2] for i in range(0, len(hexString), 2)]
+
+        granularity = 2
+        tests = 0
+
+        while len(units) >= 2 and tests < self.maxTests:
+            chunkLength = -(-len(units) // granularity)
+            reduced = False
+
+            for start in range(0, len(units), chunkLength):
+                complement = units[:start] + units[start + chunkLength:]
+                tests += 1
+
+                if self.Diverges(snapshot, "".join(complement), engine):
+                    units = complement
+                    granularity = max(granularity - 1, 2)
+                    reduced = True
+                    break
+
+                if tests >= self.maxTests:
+                    break
+
+            if not reduced:
+                if granularity >= len(units):
+                    break
+
+                granularity = min(granularity * 2, len(units))
+
+        return "".join(units)
+
+    def ToDict(self):
+        ''' Returns our counters as a dictionary '''
+        return {
+            "verified": self.verified,
+            "referenceErrors": self.referenceErrors,
+            "divergences": self.divergenceCount
+        }
+
+    def Summary(self):
+        ''' Returns a human-readable summary of our counters '''
+        return ("Shadow verification: {:,} lines verified, {:,} divergences, "
+          "{:,} the reference couldn't convert").format(self.verified,
+          self.divergenceCount, self.referenceErrors)
+
+    def __Reference(self, snapshot, hexString):
+        '''
+        Returns the reference's (output, state) for hexString
+        from snapshot, or None if it fails.
+        '''
+        statePad = ADrawingPad()
+        statePad.Restore(snapshot)
+
+        referencePad = AReferencePad()
+
+        for name in self.kStateNames:
+            setattr(referencePad, name, getattr(statePad, name))
+
+        try:
+            output = referencePad.Action(hexString)
+        except Exception:
+            return None
+
+        return output, self.__State(referencePad)
+
+    def __State(self, drawingPad):
+        ''' Returns drawingPad's state, comparably '''
+        values = [getattr(drawingPad, name) for name in self.kStateNames]
+
+        return tuple(
+            tuple(value) if isinstance(value, (tuple, list)) else value
+            for value in values
+        )
+
+    @staticmethod
+    def __Text(output):
+        ''' Returns output as text, however Action returned it '''
+        if isinstance(output, Exception):
+            return type(output).__name__ + ": " + str(output)
+        if isinstance(output, str):
+            return output
+
+        return ";\n".join([str(command) for command in output]) + ";"
+
+class AInstructionFuzzer:
+    '''
+    Generates random lines of hexadecimal instructions that lean on the
+    edge cases: arguments at and past their bounds, the wrong number of
+    them, moves across the pad's edges, junk, and odd nibbles.
+
+    Run() checks them property by property against the reference with
+    an AShadowVerifier.
+    '''
+    # Codes that are never opcodes, and odd chars, used as junk
+    kJunkCodes = ("00", "12", "7F", "FF", "ff", "c0", "E1")
+    kOddChars = ("1", "7", "Z", "0")
+
+    # Coordinates worth hitting: the pad's edges and just past them
+    kEdgeValues = (-8192, -8191, -1, 0, 1, 4000, -4000, 8000, 8191, 8192)
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.hexDecConverter = AHexDecConverter()
+
+    def Line(self):
+        ''' Returns a random line, ending in "\\n" most of the time '''
+        randomness = self.random
+        encode = self.hexDecConverter.Encode
+        parts = []
+
+        for i in range(randomness.randint(0, 12)):
+            kind = randomness.random()
+
+            if kind < 0.1:
+                parts.append("F0")
+            elif kind < 0.25:
+                parts.append("80" + "".join(
+                    encode(randomness.choice((0, 1, 5)))
+                    for j in range(randomness.choice((1, 1, 1, 0, 2)))
+                ))
+            elif kind < 0.4:
+                parts.append("A0" + "".join(
+                    encode(randomness.choice((0, 255, 128, 300, -1)))
+                    for j in range(randomness.choice((4, 4, 3, 5)))
+                ))
+            elif kind < 0.85:
+                parts.append("C0" + "".join(
+                    encode(self.__Coordinate())
+                    for j in range(randomness.choice((2, 4, 6, 8, 3, 20)))
+                ))
+            elif kind < 0.9:
+                parts.append(randomness.choice(self.kJunkCodes))
+            else:
+                parts.append(randomness.choice(self.kOddChars))
+
+        line = "".join(parts)
+
+        if randomness.random() < 0.7:
+            line += "\n"
+
+        return line
+
+    def Run(self, iterations, linesPerRun=6, verifier=None, **padOptions):
+        '''
+        Converts iterations runs of linesPerRun lines, each run with a
+        fresh pad, verifying every line. Lines of plain hex are also
+        verified as raw binary, on a pad in the same state.
+
+        Returns the AShadowVerifier holding the results.
+        '''
+        if verifier is None:
+            verifier = AShadowVerifier()
+
+        for i in range(iterations):
+            drawingPad = ADrawingPad(verifier=verifier, **padOptions)
+
+            for j in range(linesPerRun):
+                line = self.Line()
+
+                if self.__IsHex(line):
+                    bytesPad = ADrawingPad(verifier=verifier, **padOptions)
+                    bytesPad.Restore(drawingPad.Snapshot())
+
+                    try:
+                        bytesPad.ActionBytes(bytes.fromhex(line))
+                    except Exception:
+                        pass
+
+                try:
+                    drawingPad.Action(line)
+                except Exception:
+                    # A failed line leaves the pad as it stopped
+                    pass
+
+        return verifier
+
+    def __Coordinate(self):
+        ''' Returns a random coordinate delta, often an edge value '''
+        randomness = self.random
+        kind = randomness.random()
+
+        if kind < 0.3:
+            return randomness.randint(-8192, 8191)
+        if kind < 0.6:
+            return randomness.randint(-300, 300)
+
+        return randomness.choice(self.kEdgeValues)
+
+    @staticmethod
+    def __IsHex(line):
+        ''' Returns whether line is whole bytes of uppercase hex '''
+        return (len(line) % 2 == 0 and len(line) > 0 and
+          all(char in "0123456789ABCDEF" for char in line))
+
+def Main(arguments=None):
+    '''
+    Fuzzes the drawing pad with generated instructions, checking every
+    line against the original implementation.
+    '''
+    parser = argparse.ArgumentParser(description=Main.__doc__)
+    parser.add_argument("--iterations", type=int, default=1000,
+      help="Runs of lines to convert, each with a fresh pad.")
+    parser.add_argument("--lines", type=int, default=6,
+      help="Lines per run.")
+    parser.add_argument("--seed", type=int, default=0,
+      help="Seed for the generated lines.")
+    parser.add_argument("--engine", choices=ADrawingPad.kEngines,
+      default="python", help="Engine used to move the pen.")
+    parser.add_argument("--show", type=int, default=5,
+      help="Divergences to print.")
+    arguments = parser.parse_args(arguments)
+
+    instructionFuzzer = AInstructionFuzzer(arguments.seed)
+    verifier = instructionFuzzer.Run(
+        arguments.iterations, arguments.lines, engine=arguments.engine
+    )
+
+    print(verifier.Summary())
+
+    for divergence in verifier.divergences[:arguments.show]:
+        print()
+        print("Line:         " + repr(divergence["line"]))
+        print("Minimal line: " + repr(divergence["minimalLine"]))
+        print("Output:")
+        print(divergence["output"])
+        print("Reference output:")
+        print(divergence["referenceOutput"])
+
+    if verifier.divergenceCount:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,342 @@
+from CommandRecords import AClearCommand, AColorCommand, AMoveCommand
+from CommandRecords import APenCommand, ParseCommand
+from DrawingPad import ADrawingPad
+from LineClipper import ALineClipper
+
+from array import array
+
+import os
+import pickle
+
+class AStrokeIndex:
+    '''
+    Uniform grid over the pad of every pen-down segment drawn, with its
+    color, for rectangle and point queries.
+
+    Segments are added as commands arrive: an ADrawingPad given an index
+    adds the commands it builds, and Insert() adds any others. Like the
+    pad we follow the pen from the commands, so each "MV" point with the
+    pen down ends a segment from the point before it.
+
+    "CLR" starts a new frame, so queries can ask for what was drawn
+    since a given "CLR", or across every frame.
+
+    Each segment is listed in every cellSize cell it passes through.
+    Cells on the pad's edges also hold what lies beyond them. If path
+    is given, segments are loaded from it and Save() writes them back.
+    '''
+    # Width and height of a cell, in pad units
+    kCellSize = 256
+
+    # Version of what Save() writes
+    kFileVersion = 1
+
+    def __init__(self, cellSize=kCellSize, path=None):
+        if cellSize < 1:
+            raise ValueError("cellSize must be at least 1.")
+
+        self.cellSize = cellSize
+        self.path = path
+
+        # ((x-min, x-max), (y-min, y-max))
+        self.minMaxCoordinatePointValues = (
+            ADrawingPad.kMinMaxCoordinatePointValues
+        )
+        (minX, maxX), (minY, maxY) = self.minMaxCoordinatePointValues
+
+        # Grid size in cells
+        self.cellsAcross = (maxX - minX) // cellSize + 1
+        self.cellsDown = (maxY - minY) // cellSize + 1
+
+        self.Clear()
+
+        if path is not None and os.path.exists(path):
+            self.Load()
+
+    def __len__(self):
+        ''' Returns the number of segments we hold '''
+        return len(self.frames)
+
+    def Clear(self):
+        ''' Drops every segment and resets the pen '''
+        # Flat x0, y0, x1, y1 of each segment
+        self.coordinates = array("q")
+
+        # Each segment's color, as an index into colors, and frame
+        self.colorIds = array("I")
+        self.frames = array("I")
+
+        # Colors in the order we first saw them, and their indexes
+        self.colors = []
+        self.colorIndexes = {}
+
+        # Cell key: array of the ids of segments through the cell
+        self.cells = {}
+
+        # The pen's state, as ADrawingPad starts it
+        self.currentPoint = (0, 0)      # Current pen coordinates
+        self.penUp = True               # If the pen is currently up or not
+        self.penColor = (0, 0, 0, 255)  # The pen's current color
+
+        # Number of "CLR"s seen
+        self.frame = 0
+
+    def Insert(self, commands):
+        ''' Adds commands, CommandRecords objects or their text form '''
+        for command in commands:
+            if isinstance(command, str):
+                command = ParseCommand(command)
+
+            self.Add(command)
+
+    def Add(self, command):
+        ''' Adds a single CommandRecords command '''
+        if isinstance(command, AMoveCommand):
+            self.AddMove(command.points)
+        elif isinstance(command, APenCommand):
+            self.penUp = command.up
+        elif isinstance(command, AColorCommand):
+            self.penColor = command.color
+        elif isinstance(command, AClearCommand):
+            self.currentPoint = (0, 0)
+            self.penUp = True
+            self.penColor = (0, 0, 0, 255)
+            self.frame += 1
+
+    def AddMove(self, points):
+        ''' Adds "MV" through points, a list of (x, y) tuples '''
+        if not points:
+            return
+
+        if not self.penUp:
+            lastPoint = self.currentPoint
+
+            for point in points:
+                self.__AddSegment(lastPoint, point)
+                lastPoint = point
+
+        self.currentPoint = points[-1]
+
+    def QueryRectangle(self, minX, minY, maxX, maxY, frame=None):
+        '''
+        Returns the ids of the segments that touch the rectangle, edges
+        included, in the order they were drawn. If frame is given, only
+        segments drawn in it are returned.
+        '''
+        if minX > maxX or minY > maxY:
+            return []
+
+        firstColumn, firstRow, lastColumn, lastRow = self.__CellRange(
+            minX, minY, maxX, maxY
+        )
+
+        candidates = set()
+
+        for row in range(firstRow, lastRow + 1):
+            for column in range(firstColumn, lastColumn + 1):
+                segmentIds = self.cells.get(row * self.cellsAcross + column)
+
+                if segmentIds is not None:
+                    candidates.update(segmentIds)
+
+        lineClipper = ALineClipper(((minX, maxX), (minY, maxY)), "exact")
+        coordinates = self.coordinates
+        frames = self.frames
+        segmentIds = []
+
+        for segmentId in sorted(candidates):
+            if frame is not None and frames[segmentId] != frame:
+                continue
+
+            offset = segmentId * 4
+            startPoint = (coordinates[offset], coordinates[offset + 1])
+            endPoint = (coordinates[offset + 2], coordinates[offset + 3])
+
+            if lineClipper.Clip(startPoint, endPoint) is not None:
+                segmentIds.append(segmentId)
+
+        return segmentIds
+
+    def QueryPoint(self, x, y, radius=0, frame=None):
+        '''
+        Returns the ids of the segments that pass within radius of
+        (x, y) along both axes, in the order they were drawn.
+        '''
+        return self.QueryRectangle(
+            x - radius, y - radius, x + radius, y + radius, frame
+        )
+
+    def Segment(self, segmentId):
+        ''' Returns the (startPoint, endPoint, color, frame) of a segment '''
+        offset = segmentId * 4
+        x0, y0, x1, y1 = self.coordinates[offset:offset + 4]
+
+        return ((x0, y0), (x1, y1), self.colors[self.colorIds[segmentId]],
+          self.frames[segmentId])
+
+    def ToDict(self):
+        ''' Returns our counters as a dictionary '''
+        return {
+            "segments": len(self),
+            "cells": len(self.cells),
+            "frames": self.frame + 1,
+            "colors": len(self.colors)
+        }
+
+    def Summary(self):
+        ''' Returns a human-readable summary of our counters '''
+        counters = self.ToDict()
+
+        return ("Stroke index: {:,} segments in {:,} cells, {:,} frames, "
+          "{:,} colors").format(counters["segments"], counters["cells"],
+          counters["frames"], counters["colors"])
+
+    def Load(self):
+        ''' Reads our segments and pen from path, replacing our own '''
+        with open(self.path, "rb") as indexFile:
+            state = pickle.load(indexFile)
+
+        if state["version"] != self.kFileVersion:
+            raise ValueError(self.path + " holds an unknown index version.")
+        if state["cellSize"] != self.cellSize:
+            raise ValueError(self.path + " was indexed with a cellSize of " +
+              str(state["cellSize"]) + ".")
+
+        for name in ("coordinates", "colorIds", "frames", "colors", "cells",
+          "currentPoint", "penUp", "penColor", "frame"):
+            setattr(self, name, state[name])
+
+        self.colorIndexes = {
+            color: colorId for colorId, color in enumerate(self.colors)
+        }
+
+    def Save(self, path=None):
+        '''
+        Writes our segments and pen to path, or ours if it's None,
+        replacing it in one step.
+        '''
+        path = path if path is not None else self.path
+
+        if path is None:
+            raise ValueError("This index has no path to save to.")
+
+        state = {
+            "version": self.kFileVersion,
+            "cellSize": self.cellSize,
+            "coordinates": self.coordinates,
+            "colorIds": self.colorIds,
+            "frames": self.frames,
+            "colors": self.colors,
+            "cells": self.cells,
+            "currentPoint": self.currentPoint,
+            "penUp": self.penUp,
+            "penColor": self.penColor,
+            "frame": self.frame
+        }
+
+        temporaryPath = path + ".tmp"
+
+        with open(temporaryPath, "wb") as indexFile:
+            pickle.dump(state, indexFile, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporaryPath, path)
+
+    def __AddSegment(self, startPoint, endPoint):
+        ''' Stores the segment, and lists it in the cells it crosses '''
+        segmentId = len(self.frames)
+
+        self.coordinates.extend(startPoint)
+        self.coordinates.extend(endPoint)
+        self.frames.append(self.frame)
+
+        colorId = self.colorIndexes.get(self.penColor)
+
+        if colorId is None:
+            colorId = len(self.colors)
+            self.colors.append(self.penColor)
+            self.colorIndexes[self.penColor] = colorId
+
+        self.colorIds.append(colorId)
+
+        firstColumn, firstRow, lastColumn, lastRow = self.__CellRange(
+            min(startPoint[0], endPoint[0]), min(startPoint[1], endPoint[1]),
+            max(startPoint[0], endPoint[0]), max(startPoint[1], endPoint[1])
+        )
+
+        # Straight segments cross every cell of their bounding box,
+        # diagonal ones only some of each row's
+        if firstColumn == lastColumn or firstRow == lastRow:
+            rowSpans = [
+                (row, firstColumn, lastColumn)
+                for row in range(firstRow, lastRow + 1)
+            ]
+        else:
+            rowSpans = self.__RowSpans(startPoint, endPoint, firstRow, lastRow)
+
+        for row, firstColumn, lastColumn in rowSpans:
+            for column in range(firstColumn, lastColumn + 1):
+                key = row * self.cellsAcross + column
+                segmentIds = self.cells.get(key)
+
+                if segmentIds is None:
+                    segmentIds = self.cells[key] = array("I")
+
+                segmentIds.append(segmentId)
+
+    def __CellRange(self, minX, minY, maxX, maxY):
+        '''
+        Returns the (firstColumn, firstRow, lastColumn, lastRow) of the
+        cells a box covers, counting the edge cells for what's beyond them.
+        '''
+        padMinX, padMinY = (values[0] for values in
+          self.minMaxCoordinatePointValues)
+        cellSize = self.cellSize
+
+        lastColumn = self.cellsAcross - 1
+        lastRow = self.cellsDown - 1
+
+        return (min(max((minX - padMinX) // cellSize, 0), lastColumn),
+          min(max((minY - padMinY) // cellSize, 0), lastRow),
+          min(max((maxX - padMinX) // cellSize, 0), lastColumn),
+          min(max((maxY - padMinY) // cellSize, 0), lastRow))
+
+    def __RowSpans(self, startPoint, endPoint, firstRow, lastRow):
+        '''
+        Yields (row, firstColumn, lastColumn) for the cells the segment
+        crosses in each row from firstRow to lastRow.
+        '''
+        padMinY = self.minMaxCoordinatePointValues[1][0]
+        cellSize = self.cellSize
+
+        minX, maxX = sorted((startPoint[0], endPoint[0]))
+        minY, maxY = sorted((startPoint[1], endPoint[1]))
+
+        for row in range(firstRow, lastRow + 1):
+            # Up to the next row's edge, so segments through the gap
+            # between two rows' last and first points are in both
+            rowMinY = padMinY + row * cellSize
+            rowMaxY = rowMinY + cellSize
+
+            # Edge rows reach as far past the pad as the segment does
+            if row == 0:
+                rowMinY = min(rowMinY, minY)
+            if row == self.cellsDown - 1:
+                rowMaxY = max(rowMaxY, maxY)
+
+            lineClipper = ALineClipper(((minX, maxX), (rowMinY, rowMaxY)),
+              "exact")
+            clippedSegment = lineClipper.Clip(startPoint, endPoint)
+
+            if clippedSegment is None:
+                continue
+
+            # The part in this row, rounded to the nearest points
+            rowStartX = clippedSegment[0][0]
+            rowEndX = clippedSegment[1][0]
+
+            firstColumn, _, lastColumn, _ = self.__CellRange(
+                min(rowStartX, rowEndX), padMinY, max(rowStartX, rowEndX),
+                padMinY
+            )
+
+            yield row, firstColumn, lastColumn
@@ -1,13 +1,139 @@
+from CommandOptimizer import ACommandOptimizer
 from DrawingPad import ADrawingPad
+from FileConverter import AFileConverter
+from PadStats import APadStats
+from SegmentCache import ASegmentCache
+from ShadowVerifier import AShadowVerifier
+from StrokeIndex import AStrokeIndex
 
-drawingPad = ADrawingPad()
+import argparse
+import sys
 
-inFile = open("input.txt", "r")
-outFile = open("output.txt", "w")
+def Main(arguments=None):
+    '''
+    Converts a file of hexadecimal instructions to drawing pad commands,
+    one line at a time.
+    '''
+    parser = argparse.ArgumentParser(description=Main.__doc__)
+    parser.add_argument("input", nargs="?", default="input.txt",
+      help="File to convert, or - for stdin. Defaults to input.txt.")
+    parser.add_argument("output", nargs="?", default="output.txt",
+      help="File to write, or - for stdout. Defaults to output.txt.")
+    parser.add_argument("--workers", type=int, default=1,
+      help="Number of worker processes. More than 1 converts in parallel.")
+    parser.add_argument("--chunk-size", type=int, default=256,
+      help="Lines per parallel task.")
+    parser.add_argument("--buffer-size", type=int, default=1 << 20,
+      help="Chars of input to decode, and of output to write, at once.")
+    parser.add_argument("--gzip-input", action="store_true", default=None,
+      help="Read gzipped input. Defaults to whether input ends in .gz.")
+    parser.add_argument("--gzip-output", action="store_true", default=None,
+      help="Write gzipped output. Defaults to whether output ends in .gz.")
+    parser.add_argument("--binary-input", action="store_true",
+      help="Read raw binary instructions instead of lines of hex.")
+    parser.add_argument("--engine", choices=ADrawingPad.kEngines,
+      default="python", help="Engine used to move the pen.")
+    parser.add_argument("--clipping", choices=("compat", "exact"),
+      default="compat", help="How segments are clipped to the pad.")
+    parser.add_argument("--stats", action="store_true",
+      help="Print counters and timings for the file to stderr.")
+    parser.add_argument("--optimize", action="store_true",
+      help="Merge moves and drop commands that don't change the drawing.")
+    parser.add_argument("--tolerance", type=float, default=0,
+      help="How far optimized moves may stray from the original points.")
+    parser.add_argument("--cache", type=int, default=0,
+      help="Lines starting with CLR to cache, when converting serially.")
+    parser.add_argument("--cache-file",
+      help="File to load cached lines from and save them to.")
+    parser.add_argument("--checkpoint",
+      help="File to save checkpoints to, and resume from if it exists.")
+    parser.add_argument("--checkpoint-interval", type=int, default=1 << 26,
+      help="Bytes of input to convert between checkpoints.")
+    parser.add_argument("--verify", type=float, default=0,
+      help="Share of lines to check against the original implementation, "
+      "when converting serially.")
+    parser.add_argument("--index",
+      help="File to save a stroke index of the drawing to, when "
+      "converting serially.")
+    parser.add_argument("--cell-size", type=int, default=AStrokeIndex.kCellSize,
+      help="Width and height of a stroke index cell, in pad units.")
+    arguments = parser.parse_args(arguments)
 
-for line in inFile:
-    outFile.write(drawingPad.Action(line))
-    outFile.write("\n\n")
+    if (arguments.cache or arguments.cache_file) and (arguments.workers > 1 or
+      arguments.binary_input):
+        parser.error("--cache and --cache-file need a serial conversion of "
+          "lines of hex.")
+    if arguments.verify and (arguments.workers > 1 or arguments.binary_input):
+        parser.error("--verify needs a serial conversion of lines of hex.")
+    if arguments.verify and arguments.clipping != "compat":
+        parser.error("--verify needs compat clipping.")
 
-inFile.close()
-outFile.close()
\ No newline at end of file
+    # Only regular, uncompressed files can be converted resumably
+    streamed = any(path == "-" or path.endswith(".gz")
+      for path in (arguments.input, arguments.output))
+
+    if arguments.checkpoint and (arguments.workers > 1 or
+      arguments.binary_input or arguments.gzip_input or
+      arguments.gzip_output or streamed):
+        parser.error("--checkpoint needs a serial conversion of a regular, "
+          "uncompressed file of hex to another.")
+    if arguments.index and (arguments.workers > 1 or arguments.checkpoint):
+        parser.error("--index needs a serial conversion without --checkpoint.")
+
+    stats = APadStats() if arguments.stats else None
+
+    optimizer = None
+    if arguments.optimize:
+        optimizer = ACommandOptimizer(arguments.tolerance)
+
+    cache = None
+    if arguments.cache > 0 or arguments.cache_file:
+        cache = ASegmentCache(arguments.cache or 4096,
+          path=arguments.cache_file)
+
+    padOptions = {"engine": arguments.engine, "clipping": arguments.clipping}
+
+    verifier = None
+    if arguments.verify:
+        verifier = AShadowVerifier(arguments.verify)
+        padOptions["verifier"] = verifier
+
+    strokeIndex = None
+    if arguments.index:
+        strokeIndex = AStrokeIndex(arguments.cell_size)
+        padOptions["index"] = strokeIndex
+
+    fileConverter = AFileConverter(
+        arguments.workers, arguments.chunk_size, arguments.buffer_size,
+        stats, optimizer, cache, arguments.checkpoint_interval, **padOptions
+    )
+
+    fileConverter.Convert(arguments.input, arguments.output,
+      arguments.gzip_input, arguments.gzip_output, arguments.binary_input,
+      arguments.checkpoint)
+
+    if cache is not None and cache.path is not None:
+        cache.Save()
+
+    if strokeIndex is not None:
+        strokeIndex.Save(arguments.index)
+
+    if stats is not None:
+        print(arguments.input + ":", file=sys.stderr)
+        print(stats.Summary(), file=sys.stderr)
+
+        if cache is not None:
+            print(cache.Summary(), file=sys.stderr)
+
+        if strokeIndex is not None:
+            print(strokeIndex.Summary(), file=sys.stderr)
+
+    if verifier is not None:
+        print(verifier.Summary(), file=sys.stderr)
+
+        for divergence in verifier.divergences:
+            print("Diverges: " + repr(divergence["minimalLine"]),
+              file=sys.stderr)
+
+if __name__ == "__main__":
+    Main()
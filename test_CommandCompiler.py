@@ -0,0 +1,37 @@
+from CommandCompiler import ACommandCompiler
+from DrawingPad import ADrawingPad
+
+import unittest
+
+class ACommandCompilerTest(unittest.TestCase):
+    ''' Checks that compiled commands convert back to the same drawing '''
+    def RoundTrip(self, commands, pack=False):
+        ''' Returns commands compiled, then converted by a fresh pad '''
+        return ADrawingPad().Action(
+            ACommandCompiler(pack).Compile(commands)
+        )
+
+    def testSameText(self):
+        commands = ["CLR", "C0 255 0 0 255", "PEN DOWN",
+          "MV (61, 35) (-7906, -8157)", "PEN UP", "MV (8191, 8191)"]
+
+        self.assertEqual(self.RoundTrip(commands),
+          ";\n".join(commands) + ";")
+
+    def testSplitAddsPoints(self):
+        # Both points are on the pad, but 16000 apart, so the jump is
+        # split in two steps through (0, 0)
+        commands = ["CLR", "MV (-8000, 0)", "PEN DOWN", "MV (8000, 0)"]
+
+        self.assertEqual(self.RoundTrip(commands),
+          "CLR;\nMV (-8000, 0);\nPEN DOWN;\nMV (0, 0) (8000, 0);")
+
+    def testPack(self):
+        commands = ["CLR", "MV (5, 5)", "MV (7, 7)", "PEN DOWN",
+          "MV (1, 1)", "MV (2, 2)"]
+
+        self.assertEqual(self.RoundTrip(commands, pack=True),
+          "CLR;\nMV (7, 7);\nPEN DOWN;\nMV (1, 1) (2, 2);")
+
+if __name__ == "__main__":
+    unittest.main()
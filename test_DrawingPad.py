@@ -0,0 +1,44 @@
+from CommandRecords import AMoveCommand
+from DrawingPad import ADrawingPad
+
+import unittest
+
+def HandleDot(drawingPad, hexArgs):
+    ''' Draws a dot at the point decoded from hexArgs '''
+    x, y = drawingPad.DecodeArgs(hexArgs)
+    drawingPad.AddCommand(AMoveCommand([(x, y)]))
+
+class ADotPad(ADrawingPad):
+    ''' ADrawingPad with an extra "DOT" opcode '''
+
+ADotPad.RegisterOpcode("9A", "DOT", 4, HandleDot)
+
+class ARegisterOpcodeTest(unittest.TestCase):
+    ''' Checks that registering opcodes leaves the codebook's lines alone '''
+    kLines = (
+        "F0A04000417F4000417FC040004000804001C05F205F20804000",
+        "F0A0417F40004000417FC067086708804001C0670840004000187818784000804000",
+        "F0C0401240018040014012",
+        "F0804001C0401240124012401240124012",
+        "F0A0127F4000127F127FC07F7F7F7F00010001",
+        "F0C040014001A04000417F4000417F804000C04012",
+        "12F0804001801240C0400140018000"
+    )
+
+    def testCodebookLines(self):
+        for line in self.kLines:
+            self.assertEqual(ADotPad().Action(line), ADrawingPad().Action(line))
+
+    def testNewOpcode(self):
+        self.assertEqual(ADotPad().Action("F09A40014002"), "CLR;\nMV (1, 2);")
+        self.assertNotIn("9A", ADrawingPad.kCodebook)
+
+    def testArgumentBytes(self):
+        for opcode in ("00", "12", "7F"):
+            with self.assertRaises(ValueError):
+                type("APad", (ADrawingPad,), {}).RegisterOpcode(
+                    opcode, "BAD", 0, HandleDot
+                )
+
+if __name__ == "__main__":
+    unittest.main()
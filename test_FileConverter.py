@@ -0,0 +1,50 @@
+from DrawingPad import ADrawingPad
+from FileConverter import AFileConverter
+
+import os
+import tempfile
+import unittest
+
+class AFileConverterTest(unittest.TestCase):
+    ''' Checks what AFileConverter writes when a line fails to convert '''
+    kLines = ("F0A0417F417F417F417F", "80014000", "C040014001", "F0C0ZZZZ4000",
+      "C040024002")
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inPath = os.path.join(self.directory.name, "input.txt")
+        self.outPath = os.path.join(self.directory.name, "output.txt")
+
+        with open(self.inPath, "w") as inFile:
+            inFile.write("\n".join(self.kLines) + "\n")
+
+        # The output of the lines before the bad one, as alpc2.py writes it
+        drawingPad = ADrawingPad()
+        self.expected = "".join(
+            drawingPad.Action(line + "\n") + "\n\n" for line in self.kLines[:3]
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def Check(self, workers, **options):
+        ''' Converts the file, checking the output before the bad line '''
+        fileConverter = AFileConverter(workers, chunkSize=2, **options)
+
+        with self.assertRaises(ValueError):
+            fileConverter.Convert(self.inPath, self.outPath)
+
+        with open(self.outPath) as outFile:
+            self.assertEqual(outFile.read(), self.expected)
+
+    def testSerial(self):
+        self.Check(1)
+
+    def testSerialSmallBuffer(self):
+        self.Check(1, bufferSize=1)
+
+    def testParallel(self):
+        self.Check(2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+from DrawingPad import ADrawingPad, numpy
+from ShadowVerifier import AInstructionFuzzer, AShadowVerifier
+
+import random
+import unittest
+
+class AShadowVerifierTest(unittest.TestCase):
+    ''' Fuzzes the drawing pad against the original implementation '''
+    def Fuzz(self, seed, **padOptions):
+        ''' Checks generated lines from seed, failing on a divergence '''
+        verifier = AInstructionFuzzer(seed).Run(
+            300, 6, AShadowVerifier(maxDivergences=1), **padOptions
+        )
+
+        self.assertGreater(verifier.verified, 0)
+        self.assertEqual(verifier.divergenceCount, 0, verifier.divergences)
+
+    def testPythonEngine(self):
+        self.Fuzz(0)
+        self.Fuzz(1)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed.")
+    def testNumpyEngine(self):
+        self.Fuzz(0, engine="numpy")
+        self.Fuzz(1, engine="numpy")
+
+class AFeedTest(unittest.TestCase):
+    ''' Checks that streaming lines in chunks converts them like Action '''
+    def testRandomChunks(self):
+        instructionFuzzer = AInstructionFuzzer(2)
+        randomness = random.Random(2)
+
+        for i in range(300):
+            actionPad = ADrawingPad(output="records")
+            feedPad = ADrawingPad(output="records")
+
+            for j in range(6):
+                line = instructionFuzzer.Line()
+
+                # Split anywhere, even inside an opcode or argument
+                cuts = sorted(randomness.sample(range(len(line) + 1),
+                  min(randomness.randint(0, 6), len(line) + 1)))
+                chunks = [line[start:end] for start, end in
+                  zip([0] + cuts, cuts + [len(line)])]
+
+                try:
+                    output = actionPad.Action(line)
+                except ValueError:
+                    with self.assertRaises(ValueError):
+                        list(feedPad.Stream(chunks))
+                    break
+
+                # Messages, like "No valid commands were parsed", aren't
+                # streamed
+                if isinstance(output, str):
+                    output = []
+
+                self.assertEqual(
+                    [str(command) for command in feedPad.Stream(chunks)],
+                    [str(command) for command in output], repr(chunks)
+                )
+
+if __name__ == "__main__":
+    unittest.main()